@@ -1,24 +1,19 @@
 from services.new_transacao import new_receita, new_despesa
 from services.criar_grafic import gerar_graficos
-from services.get_transacao import get_transacao
-from datetime import datetime, timedelta
+from services.get_transacao import registrar_memoria, memoria_sessao
+from services.frame_transacoes import get_frame_transacoes
+from services.metricas_dashboard import get_metricas_dashboard
+from services.resumo_mensal import get_resumo_mensal
+from services.formatacao import format_brl
+from datetime import datetime, date
 from auth.login import login
+from auth.sessao import restaurar_sessao, encerrar_sessao
 import streamlit as st
-import pandas as pd
-
-def format_brl(valor):
-    """Formata número para padrão brasileiro: R$ 1.381,86"""
-    try:
-        return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
 
 def main():
 
-    if "authenticated" not in st.session_state:
-        st.session_state.authenticated = False
-
-    if not st.session_state.authenticated:
+    # Um token válido na URL (ex.: após recarregar a página) dispensa o login
+    if not restaurar_sessao():
         login()
         st.stop()
 
@@ -42,18 +37,21 @@ def main():
 
         setup_sidebar()
 
-        df = get_transacao()
+        user_email = st.session_state.get("user_email", "")
+        metricas = get_metricas_dashboard(user_email, date.today())
 
-        df_numeric = df.copy()
-        df_numeric["Valor R$"] = pd.to_numeric(df_numeric["Valor R$"], errors='coerce', downcast='float')
-
-        render_dashboard_metrics(df_numeric)
+        render_dashboard_metrics(metricas)
         
-        render_smart_insights(df_numeric)
+        render_smart_insights(metricas)
         
         st.markdown("---")
+
+        frame = get_frame_transacoes(user_email)
+        registrar_memoria("transacoes", frame.df)
     
-        gerar_graficos(df_numeric)
+        gerar_graficos(frame, get_resumo_mensal(user_email))
+
+        st.sidebar.caption(f"Memória da sessão: {memoria_sessao() / 1024:.0f} KB")
 
 
 def setup_sidebar():
@@ -73,27 +71,15 @@ def setup_sidebar():
     st.sidebar.markdown("---")
     
     if st.sidebar.button("\U0001F6AA Sair", icon=":material/logout:"):
-        st.session_state.authenticated = False
+        encerrar_sessao()
         st.rerun()
 
-def render_dashboard_metrics(df):
+def render_dashboard_metrics(metricas):
     """Dashboard com métricas inteligentes"""
-    hoje = datetime.now()
-    mes_atual = hoje.month
-    ano_atual = hoje.year
-    
-    df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-    df_mes = df[
-        (df['Data'].dt.month == mes_atual) & 
-        (df['Data'].dt.year == ano_atual)
-    ]
-    
-    total_receitas = df[df["Categoria Principal"] == "Receita"]["Valor R$"].sum()
-    total_despesas = df[df["Categoria Principal"] == "Despesa"]["Valor R$"].sum()
-    saldo_total = total_receitas - total_despesas
+    saldo_total = metricas["receitas_total"] - metricas["despesas_total"]
 
-    receitas_mes = df_mes[df_mes["Categoria Principal"] == "Receita"]["Valor R$"].sum()
-    despesas_mes = df_mes[df_mes["Categoria Principal"] == "Despesa"]["Valor R$"].sum()
+    receitas_mes = metricas["receitas_mes"]
+    despesas_mes = metricas["despesas_mes"]
     
     col1, col2, col3= st.columns(3)
 
@@ -115,17 +101,14 @@ def render_dashboard_metrics(df):
             format_brl(saldo_total),
         )
     
-def render_smart_insights(df):
+def render_smart_insights(metricas):
     """Insights automáticos inteligentes"""
     st.markdown("### \U0001F9E0 Insights Automáticos")
     
     insights = []
     
-    despesas = df[df["Categoria Principal"] == "Despesa"]
-    if not despesas.empty:
-        gasto_por_categoria = despesas.groupby("Subcategoria")["Valor R$"].sum().sort_values(ascending=False)
-        categoria_maior_gasto = gasto_por_categoria.index[0]
-        valor_maior_gasto = gasto_por_categoria.iloc[0]
+    if metricas["maior_subcategoria"]:
+        categoria_maior_gasto, valor_maior_gasto = metricas["maior_subcategoria"]
         
         insights.append({
             "tipo": "info",
@@ -133,13 +116,8 @@ def render_smart_insights(df):
             "texto": f"Você gastou mais em **{categoria_maior_gasto}**: {format_brl(valor_maior_gasto)}"
         })
     
-    hoje = datetime.now()
-    df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-    ultimos_7_dias = df[df['Data'] >= (hoje - timedelta(days=7))]
-    
-    if not ultimos_7_dias.empty:
-        despesas_semana = ultimos_7_dias[ultimos_7_dias["Categoria Principal"] == "Despesa"]["Valor R$"].sum()
-        media_diaria = despesas_semana / 7
+    if metricas["despesas_7_dias"] is not None:
+        media_diaria = metricas["despesas_7_dias"] / 7
         
         if media_diaria > 50:
             insights.append({
@@ -154,8 +132,8 @@ def render_smart_insights(df):
                 "texto": f"Média diária: {format_brl(media_diaria)}. Parabéns pelo controle!"
             })
     
-    receitas_total = df[df["Categoria Principal"] == "Receita"]["Valor R$"].sum()
-    despesas_total = df[df["Categoria Principal"] == "Despesa"]["Valor R$"].sum()
+    receitas_total = metricas["receitas_total"]
+    despesas_total = metricas["despesas_total"]
     
     if receitas_total > 0:
         percentual_gasto = (despesas_total / receitas_total) * 100
@@ -192,31 +170,5 @@ def render_smart_insights(df):
             else:
                 st.info(f"**{insight['titulo']}**\n\n{insight['texto']}")
 
-def get_receitas_mes_anterior(df, hoje):
-    """Calcula receitas do mês anterior"""
-    mes_anterior = hoje.month - 1 if hoje.month > 1 else 12
-    ano = hoje.year if hoje.month > 1 else hoje.year - 1
-    
-    df_mes_anterior = df[
-        (df['Data'].dt.month == mes_anterior) & 
-        (df['Data'].dt.year == ano) &
-        (df["Categoria Principal"] == "Receita")
-    ]
-    
-    return df_mes_anterior["Valor R$"].sum()
-
-def get_despesas_mes_anterior(df, hoje):
-    """Calcula despesas do mês anterior"""
-    mes_anterior = hoje.month - 1 if hoje.month > 1 else 12
-    ano = hoje.year if hoje.month > 1 else hoje.year - 1
-    
-    df_mes_anterior = df[
-        (df['Data'].dt.month == mes_anterior) & 
-        (df['Data'].dt.year == ano) &
-        (df["Categoria Principal"] == "Despesa")
-    ]
-    
-    return df_mes_anterior["Valor R$"].sum()
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
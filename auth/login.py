@@ -1,12 +1,10 @@
 from config.db_config import connect_db
 from auth.register import cadastro
+from auth.senhas import verificar_senha, precisa_novo_hash, gerar_hash
+from auth.sessao import iniciar_sessao, CAMPO_VERSAO
 import streamlit as st
-import bcrypt
 
 def login():
-    db = connect_db()
-
-    users = db.get_collection("usuarios")  
 
     col1, col2 = st.columns([2,2])
     with col1:
@@ -20,18 +18,40 @@ def login():
         search_senha = st.text_input("Senha:", type="password", key="senha_login", width=500)
 
         if st.button("Continue", width=500, type="primary"):
-            usuario = users.find_one({"email": search_email})
+            # O banco só é consultado ao enviar o formulário, não a cada renderização da tela
+            db = connect_db()
+            if db is None:
+                st.stop()
+            users = db.get_collection("usuarios")
+
+            usuario = users.find_one({"email": search_email}, {"email": 1, "senha": 1, CAMPO_VERSAO: 1})
             if usuario == None:
                 st.error("Usuário não encontrado!")
             else:
                 senha_hash = usuario['senha']
-                if bcrypt.checkpw(search_senha.encode("utf-8"), senha_hash):
+                try:
+                    with st.spinner("Verificando..."):
+                        senha_correta = verificar_senha(search_senha, senha_hash)
+                except RuntimeError as e:
+                    st.warning(str(e))
+                    st.stop()
+
+                if senha_correta:
+                    versao = usuario.get(CAMPO_VERSAO, 0)
+                    if precisa_novo_hash(senha_hash):
+                        # Custo do bcrypt alterado: atualiza o hash enquanto a senha está disponível
+                        # e revoga os tokens emitidos com o hash anterior
+                        users.update_one(
+                            {"_id": usuario["_id"]},
+                            {"$set": {"senha": gerar_hash(search_senha)}, "$inc": {CAMPO_VERSAO: 1}}
+                        )
+                        versao += 1
                     st.success("Logado com sucesso!")
-                    st.session_state.authenticated = True
+                    iniciar_sessao(usuario["email"], versao)
                     st.rerun()
                 else:
                     st.warning("Senha incorreta! Digite novamente")
 
         st.markdown("---")
         if st.button("Criar Conta", width=500):
-            cadastro(users=users)
\ No newline at end of file
+            cadastro()
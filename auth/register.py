@@ -1,9 +1,11 @@
+from config.db_config import connect_db
+from auth.senhas import gerar_hash
+from pymongo.errors import DuplicateKeyError
 import streamlit as st
-import bcrypt
 
 
 @st.dialog("Criar conta")
-def cadastro(users):
+def cadastro():
 
     nome = st.text_input("Nome:", key="nome")
     email = st.text_input("Email:", key="email")
@@ -17,12 +19,28 @@ def cadastro(users):
         elif len(senha) < 6:
             st.warning("A senha deve ter pelo menos 6 caracteres.")
 
-        elif users.find_one({'email': email}):
-            st.warning("E-mail já cadastrado. Digite outro!")
-
         else:
-            senha_hash = bcrypt.hashpw(senha.encode("utf-8"), bcrypt.gensalt())
-            senha_hash_str = senha_hash.decode("utf-8")
-            users.insert_one({"nome": nome, "email": email, "senha": senha_hash_str})
+            db = connect_db()
+            if db is None:
+                return
+            users = db.get_collection("usuarios")
+
+            if users.find_one({'email': email}, {"_id": 1}):
+                st.warning("E-mail já cadastrado. Digite outro!")
+                return
+
+            try:
+                with st.spinner("Criando conta..."):
+                    senha_hash = gerar_hash(senha)
+            except RuntimeError as e:
+                st.warning(str(e))
+                return
+
+            try:
+                users.insert_one({"nome": nome, "email": email, "senha": senha_hash})
+            except DuplicateKeyError:
+                # Outro cadastro com o mesmo e-mail entrou depois da verificação acima (índice email_unico)
+                st.warning("E-mail já cadastrado. Digite outro!")
+                return
             st.success("Conta criada com sucesso!")
-            st.rerun()
\ No newline at end of file
+            st.rerun()
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import threading
+import bcrypt
+
+# Custo padrão do bcrypt (o mesmo de bcrypt.gensalt())
+ROUNDS_PADRAO = 12
+
+# Pool único por processo: no máximo BCRYPT_WORKERS hashes ao mesmo tempo, os demais esperam na fila
+_executor = None
+_fila = None
+_lock = threading.Lock()
+
+
+def _config(chave, padrao):
+    """Lê uma configuração opcional do secrets.toml"""
+    try:
+        return st.secrets.get(chave, padrao)
+    except Exception:
+        return padrao
+
+
+def _pool():
+    """Cria o pool e o limite da fila na primeira chamada"""
+    global _executor, _fila
+
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                trabalhadores = int(_config("BCRYPT_WORKERS", 2))
+                _fila = threading.BoundedSemaphore(trabalhadores * int(_config("BCRYPT_FILA_POR_WORKER", 8)))
+                _executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="bcrypt")
+    return _executor, _fila
+
+
+def _executar(funcao, *args):
+    """Executa funcao no pool e espera o resultado; recusa quando a fila está cheia"""
+    executor, fila = _pool()
+    if not fila.acquire(timeout=float(_config("BCRYPT_ESPERA_SEGUNDOS", 10))):
+        raise RuntimeError("Muitos acessos ao mesmo tempo, tente novamente em instantes")
+    try:
+        return executor.submit(funcao, *args).result()
+    finally:
+        fila.release()
+
+
+def rounds_configurados():
+    """Fator de custo do bcrypt (BCRYPT_ROUNDS no secrets.toml)"""
+    return int(_config("BCRYPT_ROUNDS", ROUNDS_PADRAO))
+
+
+def _rounds(senha_hash):
+    """Custo gravado em um hash bcrypt ($2b$12$...)"""
+    try:
+        return int(senha_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def gerar_hash(senha):
+    """Hash bcrypt da senha, como texto para gravar no banco"""
+    salt = bcrypt.gensalt(rounds=rounds_configurados())
+    return _executar(bcrypt.hashpw, senha.encode("utf-8"), salt).decode("utf-8")
+
+
+def verificar_senha(senha, senha_hash):
+    """Confere a senha com o hash gravado, em texto ou bytes"""
+    if isinstance(senha_hash, str):
+        senha_hash = senha_hash.encode("utf-8")
+    try:
+        return _executar(bcrypt.checkpw, senha.encode("utf-8"), senha_hash)
+    except ValueError:
+        # Hash gravado em formato inválido
+        return False
+
+
+def precisa_novo_hash(senha_hash):
+    """Indica se o hash foi gerado com um custo diferente do configurado"""
+    if isinstance(senha_hash, bytes):
+        senha_hash = senha_hash.decode("utf-8")
+    return _rounds(senha_hash) != rounds_configurados()
@@ -0,0 +1,128 @@
+from config.db_config import connect_db
+import streamlit as st
+import secrets
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+PARAMETRO_SESSAO = "sessao"
+
+# Versão das sessões do usuário em `usuarios`: incrementá-la revoga todos os tokens já emitidos
+CAMPO_VERSAO = "versao_sessao"
+
+# Sem SESSION_SECRET configurado, a chave vale só enquanto o processo estiver no ar
+_segredo_processo = secrets.token_bytes(32)
+
+
+def _config(chave, padrao):
+    """Lê uma configuração opcional do secrets.toml"""
+    try:
+        return st.secrets.get(chave, padrao)
+    except Exception:
+        return padrao
+
+
+def _segredo():
+    segredo = _config("SESSION_SECRET", None)
+    return segredo.encode("utf-8") if segredo else _segredo_processo
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinatura(conteudo):
+    return hmac.new(_segredo(), conteudo.encode("ascii"), hashlib.sha256).digest()
+
+
+def criar_token(email, versao=0, agora=None):
+    """Token assinado com o e-mail, a versão de sessão do usuário e a validade (SESSAO_HORAS no secrets.toml)"""
+    agora = time.time() if agora is None else agora
+    expira = int(agora + float(_config("SESSAO_HORAS", 8)) * 3600)
+    dados = {"email": email, "versao": versao, "expira": expira}
+    conteudo = _b64(json.dumps(dados, separators=(",", ":")).encode("utf-8"))
+    return f"{conteudo}.{_b64(_assinatura(conteudo))}"
+
+
+def validar_token(token, agora=None):
+    """(e-mail, versão) do token se a assinatura confere e ele não expirou; senão None"""
+    try:
+        conteudo, assinatura = token.split(".")
+        if not hmac.compare_digest(_de_b64(assinatura), _assinatura(conteudo)):
+            return None
+        dados = json.loads(_de_b64(conteudo))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+    agora = time.time() if agora is None else agora
+    if not isinstance(dados, dict) or not isinstance(dados.get("expira"), int) or dados["expira"] <= agora:
+        return None
+    if not isinstance(dados.get("email"), str) or not isinstance(dados.get("versao"), int):
+        return None
+    return dados["email"], dados["versao"]
+
+
+def revogar_sessoes(users, email):
+    """Invalida todos os tokens do usuário (saída, troca ou atualização da senha)"""
+    users.update_one({"email": email}, {"$inc": {CAMPO_VERSAO: 1}})
+
+
+def iniciar_sessao(email, versao=0):
+    """Marca a sessão como autenticada e guarda o token na URL, que sobrevive ao recarregar a página"""
+    token = criar_token(email, versao)
+    st.session_state.authenticated = True
+    st.session_state.user_email = email
+    st.session_state.token_sessao = token
+    st.query_params[PARAMETRO_SESSAO] = token
+
+
+def restaurar_sessao():
+    """Autentica pelo token da URL, sem bcrypt (uma busca pelo e-mail); retorna se está autenticado"""
+    if st.session_state.get("authenticated"):
+        # A navegação entre páginas descarta os parâmetros da URL: recoloca o token
+        token = st.session_state.get("token_sessao")
+        if token and st.query_params.get(PARAMETRO_SESSAO) != token:
+            st.query_params[PARAMETRO_SESSAO] = token
+        return True
+
+    token = st.query_params.get(PARAMETRO_SESSAO)
+    sessao = validar_token(token) if token else None
+
+    if sessao:
+        # Token de uma sessão já encerrada (versão antiga) não vale mais
+        email, versao = sessao
+        db = connect_db()
+        usuario = db.get_collection("usuarios").find_one({"email": email}, {CAMPO_VERSAO: 1}) if db is not None else None
+        if not usuario or usuario.get(CAMPO_VERSAO, 0) != versao:
+            sessao = None
+
+    if not sessao:
+        if token:
+            del st.query_params[PARAMETRO_SESSAO]
+        return False
+
+    st.session_state.authenticated = True
+    st.session_state.user_email = email
+    st.session_state.token_sessao = token
+    return True
+
+
+def encerrar_sessao():
+    """Sai da conta, revoga os tokens emitidos e remove o token da URL"""
+    email = st.session_state.get("user_email")
+    if email:
+        db = connect_db()
+        if db is not None:
+            revogar_sessoes(db.get_collection("usuarios"), email)
+
+    st.session_state.authenticated = False
+    st.session_state.pop("user_email", None)
+    st.session_state.pop("token_sessao", None)
+    if PARAMETRO_SESSAO in st.query_params:
+        del st.query_params[PARAMETRO_SESSAO]
@@ -1,21 +1,103 @@
+from config.indices import garantir_indices
 from pymongo import MongoClient
 import streamlit as st
+import threading
+import atexit
+import time
+
+NOME_BANCO = "controle_financeiro"
+
+# Cliente único por processo do servidor, criado sob demanda
+_client = None
+_client_lock = threading.Lock()
+_ultimo_health_check = 0.0
+
+
+def _config(chave, padrao):
+    """Lê uma configuração opcional do secrets.toml"""
+    try:
+        return st.secrets.get(chave, padrao)
+    except Exception:
+        return padrao
+
+
+def get_client():
+    """Retorna o MongoClient compartilhado, criando-o na primeira chamada"""
+    global _client, _ultimo_health_check
+
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            url_connection = _config("URL_CONNECTION_MONGO", None)
+            if not url_connection:
+                raise ValueError("URL de conexão MongoDB não configurada")
+
+            client = MongoClient(
+                url_connection,
+                maxPoolSize=int(_config("MONGO_MAX_POOL_SIZE", 50)),
+                minPoolSize=int(_config("MONGO_MIN_POOL_SIZE", 0)),
+                maxIdleTimeMS=int(_config("MONGO_MAX_IDLE_TIME_MS", 300000)),
+                serverSelectionTimeoutMS=5000
+            )
+            client.admin.command('ping')
+
+            if _config("MONGO_CRIAR_INDICES", True):
+                garantir_indices(client.get_database(NOME_BANCO))
+
+            _client = client
+            _ultimo_health_check = time.monotonic()
+
+            if _config("CACHE_CHANGE_STREAMS", False):
+                # Importado aqui para evitar dependência circular com services
+                from services.observador_mudancas import iniciar_observador
+                iniciar_observador(client.get_database(NOME_BANCO))
+
+    return _client
+
+
+def health_check(forcar=False):
+    """Verifica a conexão no máximo uma vez por intervalo configurado"""
+    global _ultimo_health_check
+
+    intervalo = float(_config("MONGO_HEALTH_CHECK_SEGUNDOS", 60))
+    agora = time.monotonic()
+    if not forcar and agora - _ultimo_health_check < intervalo:
+        return True
+
+    # Em caso de falha a exceção sobe sem fechar o cliente: ele é compartilhado pelas outras
+    # sessões e o driver reconecta sozinho quando o servidor volta
+    get_client().admin.command('ping')
+    _ultimo_health_check = agora
+    return True
+
+
+def fechar_conexao():
+    """Fecha o cliente compartilhado (chamado no encerramento do processo)"""
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+atexit.register(fechar_conexao)
+
 
 def connect_db():
 
     try:
-        url_connection = st.secrets.get("URL_CONNECTION_MONGO")
-        if not url_connection:
-            st.error("\u274C URL de conexão MongoDB não configurada")
-            return None
-            
-        client = MongoClient(url_connection, serverSelectionTimeoutMS=5000)
-        client.admin.command('ping') 
-        
-        db = client.get_database("controle_financeiro")
-        return db
-        
+        client = get_client()
+        health_check()
+        return client.get_database(NOME_BANCO)
+
+    except ValueError:
+        st.error("\u274C URL de conexão MongoDB não configurada")
+        return None
+
     except Exception as e:
         st.error(f"\u274C Erro de conexão com MongoDB: {str(e)}")
         st.info("\U0001F4A1 Verifique se o MongoDB está rodando e as credenciais estão corretas")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,155 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import argparse
+
+# Índices declarados por coleção, um para cada formato de consulta usado nos services
+INDICES = {
+    "usuarios": [
+        IndexModel([("email", ASCENDING)], name="email_unico", unique=True),
+    ],
+    "cartoes": [
+        IndexModel(
+            [("user_email", ASCENDING), ("ativo", ASCENDING), ("nome", ASCENDING)],
+            name="usuario_ativo_nome"
+        ),
+    ],
+    "compras_cartao": [
+        IndexModel(
+            [("user_email", ASCENDING), ("cartao_id", ASCENDING), ("data_compra", DESCENDING)],
+            name="usuario_cartao_data"
+        ),
+        IndexModel([("user_email", ASCENDING), ("data_compra", DESCENDING)], name="usuario_data"),
+        # Lançamentos importados de extratos: cada impressão digital existe uma vez por usuário
+        IndexModel(
+            [("user_email", ASCENDING), ("hash_conteudo", ASCENDING)],
+            name="usuario_hash_conteudo", unique=True,
+            partialFilterExpression={"hash_conteudo": {"$exists": True}}
+        ),
+    ],
+    "faturas_cartao": [
+        IndexModel([("cartao_id", ASCENDING), ("mes_ano", ASCENDING)], name="cartao_mes", unique=True),
+    ],
+    "parcelas_cartao": [
+        IndexModel(
+            [("user_email", ASCENDING), ("cartao_id", ASCENDING), ("mes_fatura", ASCENDING)],
+            name="usuario_cartao_fatura"
+        ),
+        IndexModel([("compra_id", ASCENDING)], name="compra"),
+        IndexModel([("cartao_id", ASCENDING)], name="cartao"),
+    ],
+    "transacoes": [
+        # O _id desempata a paginação por data; o prefixo (user_email, data) atende os filtros por período
+        IndexModel(
+            [("user_email", ASCENDING), ("data", DESCENDING), ("_id", DESCENDING)],
+            name="usuario_data_id"
+        ),
+        IndexModel([("user_email", ASCENDING), ("criado_em", DESCENDING)], name="usuario_criacao"),
+        IndexModel([("user_email", ASCENDING), ("atualizado_em", DESCENDING)], name="usuario_atualizacao"),
+        # Lançamentos importados de extratos: cada impressão digital existe uma vez por usuário
+        IndexModel(
+            [("user_email", ASCENDING), ("hash_conteudo", ASCENDING)],
+            name="usuario_hash_conteudo", unique=True,
+            partialFilterExpression={"hash_conteudo": {"$exists": True}}
+        ),
+    ],
+    "transacoes_mensal": [
+        IndexModel(
+            [("user_email", ASCENDING), ("ano_mes", ASCENDING),
+             ("categoria_principal", ASCENDING), ("subcategoria", ASCENDING)],
+            name="usuario_mes_categoria", unique=True
+        ),
+    ],
+    "remocoes": [
+        IndexModel(
+            [("user_email", ASCENDING), ("colecao", ASCENDING), ("removido_em", DESCENDING)],
+            name="usuario_colecao_remocao"
+        ),
+    ],
+    "objetivos": [
+        IndexModel(
+            [("user_email", ASCENDING), ("status", ASCENDING), ("data_criacao", DESCENDING)],
+            name="usuario_status_criacao"
+        ),
+    ],
+}
+
+# Índices substituídos por outros declarados acima, removidos das instalações existentes
+INDICES_OBSOLETOS = {
+    "transacoes": ["usuario_data"],  # substituído por usuario_data_id
+    "compras_cartao": ["usuario_criacao", "usuario_atualizacao"],  # usados só pelo snapshot local das compras
+}
+
+
+def garantir_indices(db):
+    """Cria os índices declarados que ainda não existem e remove os obsoletos (idempotente)"""
+    erros = {}
+
+    for nome_colecao, nomes in INDICES_OBSOLETOS.items():
+        colecao = db.get_collection(nome_colecao)
+        existentes = {indice["name"] for indice in colecao.list_indexes()}
+        for nome in nomes:
+            if nome in existentes:
+                try:
+                    colecao.drop_index(nome)
+                except OperationFailure as e:
+                    erros[f"{nome_colecao}.{nome}"] = str(e)
+
+    for nome_colecao, indices in INDICES.items():
+        colecao = db.get_collection(nome_colecao)
+        for indice in indices:
+            try:
+                colecao.create_indexes([indice])
+            except OperationFailure as e:
+                # Índice com mesmo nome e opções diferentes, ou dados duplicados
+                erros[f"{nome_colecao}.{indice.document['name']}"] = str(e)
+
+    return erros
+
+
+def relatorio_indices(db):
+    """Lista índices declarados ausentes, índices sem uso e índices não declarados"""
+    relatorio = {"ausentes": [], "sem_uso": [], "nao_declarados": []}
+
+    for nome_colecao, indices in INDICES.items():
+        colecao = db.get_collection(nome_colecao)
+        declarados = {indice.document["name"] for indice in indices}
+        existentes = {indice["name"] for indice in colecao.list_indexes()}
+
+        for nome in sorted(declarados - existentes):
+            relatorio["ausentes"].append(f"{nome_colecao}.{nome}")
+
+        for nome in sorted(existentes - declarados - {"_id_"}):
+            relatorio["nao_declarados"].append(f"{nome_colecao}.{nome}")
+
+        try:
+            for estatistica in colecao.aggregate([{"$indexStats": {}}]):
+                if estatistica["name"] != "_id_" and estatistica["accesses"]["ops"] == 0:
+                    relatorio["sem_uso"].append(f"{nome_colecao}.{estatistica['name']}")
+        except OperationFailure:
+            # $indexStats exige permissão clusterMonitor em alguns provedores
+            pass
+
+    return relatorio
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    parser = argparse.ArgumentParser(description="Gerencia os índices do MongoDB")
+    parser.add_argument("--relatorio", action="store_true", help="apenas exibe o relatório, sem criar índices")
+    args = parser.parse_args()
+
+    db = get_client().get_database(NOME_BANCO)
+
+    if not args.relatorio:
+        erros = garantir_indices(db)
+        for indice, erro in erros.items():
+            print(f"Erro ao criar {indice}: {erro}")
+
+    relatorio = relatorio_indices(db)
+    for secao, indices in relatorio.items():
+        print(f"{secao}: {', '.join(indices) if indices else '-'}")
+
+
+if __name__ == "__main__":
+    main()
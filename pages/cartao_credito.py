@@ -1,21 +1,29 @@
+from auth.sessao import restaurar_sessao, encerrar_sessao
 import streamlit as st
 from datetime import datetime
-from services.cartao_service import CartaoService
+from services.cartao_service import CartaoService, somar_meses
+from services.datas import formatar_data
+from services.dinheiro import para_centavos, dividir_parcelas
+from services.formatacao import format_brl, formatar_coluna_brl
 import pandas as pd
 
-def format_brl(valor):
-    """Formata número para padrão brasileiro: R$ 1.381,86"""
-    try:
-        return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
-
 def main():
     st.set_page_config(
         page_title="Cartões de Crédito",
         layout="wide",
         page_icon="\U0001F4B3"
     )
+
+    # Sem sessão válida (nem token na URL), volta para a tela de login
+    if not restaurar_sessao():
+        st.switch_page("app.py")
+    
+    service = CartaoService()
+    cartoes = service.listar_cartoes()
+    
+    # Faturas atuais calculadas uma única vez por renderização
+    faturas = service.calcular_faturas_atuais(cartoes)
+    compromissos = service.listar_compromissos_futuros(cartoes)
     
     col_h1, col_h2 = st.columns([2, 2])
     
@@ -30,28 +38,29 @@ def main():
                 novo_cartao_modal()
         with col_btn2:
             if st.button("\U0001F6D2 Nova Compra", type="secondary", use_container_width=True):
-                nova_compra_modal()
+                nova_compra_modal(faturas=faturas)
 
-    setup_sidebar()
-    
-    service = CartaoService()
+    setup_sidebar(faturas)
     
-    render_estatisticas_gerais(service)
+    render_estatisticas_gerais(service, cartoes, faturas)
     
     # Lista de cartões
-    render_cartoes(service)
+    render_cartoes(cartoes, faturas, compromissos)
+
+    # Faturas por mês
+    render_faturas(service, cartoes)
 
     # Visualizar transações de crédito
-    view_transacoes_credito()
+    view_transacoes_credito(service, cartoes)
 
-def setup_sidebar():
+def setup_sidebar(faturas=None):
     """Configuração da sidebar"""
     st.sidebar.markdown("### \U0001F680 Ações Rápidas")
     
     if st.sidebar.button("\U0001F4B3 Novo Cartão", key="sidebar_cartao"):
         novo_cartao_modal()
     if st.sidebar.button("\U0001F6D2 Nova Compra", key="sidebar_compra"):
-        nova_compra_modal()
+        nova_compra_modal(faturas=faturas)
     
     st.sidebar.markdown("### \U0001F4CA Navegação")
     st.sidebar.page_link("app.py", label="\U0001F3E0 Dashboard", icon=":material/home:")
@@ -61,12 +70,12 @@ def setup_sidebar():
     st.sidebar.markdown("---")
     
     if st.sidebar.button("\U0001F6AA Sair", icon=":material/logout:"):
-        st.session_state.authenticated = False
+        encerrar_sessao()
         st.rerun()
 
-def render_estatisticas_gerais(service):
+def render_estatisticas_gerais(service, cartoes, faturas):
     """Renderiza estatísticas gerais dos cartões"""
-    stats = service.get_estatisticas_cartoes()
+    stats = service.get_estatisticas_cartoes(cartoes, faturas)
     
     if stats["total_cartoes"] == 0:
         st.info("\U0001F4DD Você ainda não possui cartões cadastrados. Adicione seu primeiro cartão!")
@@ -102,9 +111,8 @@ def render_estatisticas_gerais(service):
             st.success(f"\u2705 Apenas {stats['percentual_usado']:.1f}% do limite total em uso")
         st.progress(progress)
 
-def render_cartoes(service):
+def render_cartoes(cartoes, faturas, compromissos):
     """Renderiza lista de cartões"""
-    cartoes = service.listar_cartoes()
     
     st.markdown("### \U0001F4B3 Seus Cartões")
     
@@ -116,9 +124,14 @@ def render_cartoes(service):
         for j, col in enumerate(cols):
             if i + j < len(cartoes):
                 with col:
-                    render_cartao_card(service, cartoes[i + j])
+                    cartao = cartoes[i + j]
+                    render_cartao_card(
+                        cartao,
+                        faturas.get(cartao["_id"], 0.0),
+                        sum(compromissos.get(cartao["_id"], {}).values())
+                    )
 
-def render_cartao_card(service, cartao):
+def render_cartao_card(cartao, valor_usado, parcelas_futuras=0.0):
     """Renderiza um card individual de cartão"""
     try:
         # Validação de dados essenciais
@@ -133,7 +146,6 @@ def render_cartao_card(service, cartao):
                 return
         
         # Calcular valores com validação
-        valor_usado = service.calcular_fatura_atual(cartao["_id"])
         valor_usado = max(0, valor_usado)  # Garantir que não seja negativo
         
         limite = max(0, cartao["limite"])  # Garantir que limite não seja negativo
@@ -192,6 +204,8 @@ def render_cartao_card(service, cartao):
             
             # Informações finais
             st.markdown(f"**Disponível:** {formatar_moeda(limite_disponivel)}")
+            if parcelas_futuras > 0:
+                st.markdown(f"**Parcelas futuras:** {formatar_moeda(parcelas_futuras)}")
             st.markdown(f"*Venc: dia {dia_vencimento} • Fech: dia {dia_fechamento}*")
     
                 
@@ -199,6 +213,62 @@ def render_cartao_card(service, cartao):
         st.error(f"Erro ao renderizar cartão: {str(e)}")
         st.exception(e)
 
+def render_faturas(service, cartoes):
+    """Renderiza a fatura de um cartão em um mês (fechadas vêm congeladas do banco)"""
+    if not cartoes:
+        return
+    
+    st.markdown("### \U0001F9FE Faturas")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        indice = st.selectbox(
+            "\U0001F4B3 Cartão",
+            range(len(cartoes)),
+            format_func=lambda i: cartoes[i]["nome"],
+            key="fatura_cartao"
+        )
+        cartao = cartoes[indice]
+    
+    mes_aberto = service.mes_fatura_atual(cartao["dia_fechamento"])
+    with col2:
+        mes_ano = st.selectbox(
+            "\U0001F4C5 Mês da fatura",
+            [somar_meses(mes_aberto, -i) for i in range(12)],
+            format_func=lambda mes: f"{mes} (aberta)" if mes == mes_aberto else mes,
+            key="fatura_mes"
+        )
+    
+    fatura = service.gerar_fatura(cartao["_id"], mes_ano)
+    if not fatura:
+        st.info("Nenhuma compra nesta fatura.")
+        return
+    
+    col_total, col_disponivel = st.columns(2)
+    with col_total:
+        st.metric("\U0001F9FE Total da Fatura", format_brl(fatura["total"]))
+    with col_disponivel:
+        st.metric("\U0001F513 Limite Disponível", format_brl(fatura["limite_disponivel"]))
+    
+    df_categorias = pd.DataFrame(
+        [{"Categoria": categoria, "Total": format_brl(total)} for categoria, total in fatura["totais_categorias"].items()]
+    )
+    st.dataframe(df_categorias, use_container_width=True, hide_index=True)
+    
+    with st.expander("\U0001F4DD Itens da fatura"):
+        df_itens = pd.DataFrame([
+            {
+                "Data": formatar_data(item["data"], "%Y-%m-%d"),
+                "Descrição": item["descricao"],
+                "Categoria": categoria,
+                "Parcela": f"{item['parcela']}/{item['parcelas']}",
+                "Valor": format_brl(item["valor"])
+            }
+            for categoria, itens in fatura["categorias"].items()
+            for item in itens
+        ])
+        st.dataframe(df_itens, use_container_width=True, hide_index=True)
+
 @st.dialog("\u2795 Novo Cartão")  # ➕
 def novo_cartao_modal():
     """Modal para adicionar novo cartão"""
@@ -258,7 +328,7 @@ def novo_cartao_modal():
             st.rerun()
 
 @st.dialog("\U0001F6D2 Nova Compra")  # 🛒
-def nova_compra_modal(cartao_id=None):
+def nova_compra_modal(cartao_id=None, faturas=None):
     """Modal para adicionar nova compra"""
     st.markdown("### Registrar nova compra no cartão")
     
@@ -288,7 +358,10 @@ def nova_compra_modal(cartao_id=None):
         cartao_escolhido = next(c for c in cartoes if c["nome"] == cartao_nome)
         
         # Mostrar limite disponível
-        valor_usado = service.calcular_fatura_atual(cartao_escolhido["_id"])
+        if faturas is not None and cartao_escolhido["_id"] in faturas:
+            valor_usado = faturas[cartao_escolhido["_id"]]
+        else:
+            valor_usado = service.calcular_fatura_atual(cartao_escolhido["_id"])
         
         data_compra = st.date_input("\U0001F4C5 Data da Compra", value=datetime.now().date())
 
@@ -296,9 +369,13 @@ def nova_compra_modal(cartao_id=None):
         
         valor = st.number_input("\U0001F4B0 Valor (R$)", min_value=0.01, step=0.01)
 
+        valores_parcelas = dividir_parcelas(para_centavos(valor), parcelas)
         if parcelas > 1 and valor > 0:
-            valor_parcela = valor / parcelas
-            st.info(f"\U0001F4A1 {parcelas}x de {format_brl(valor_parcela)}")
+            primeira, demais = valores_parcelas[0] / 100, valores_parcelas[1] / 100
+            if primeira == demais:
+                st.info(f"\U0001F4A1 {parcelas}x de {format_brl(demais)}")
+            else:
+                st.info(f"\U0001F4A1 1x de {format_brl(primeira)} + {parcelas - 1}x de {format_brl(demais)}")
     
     with col2:
         descricao = st.text_input("\U0001F4DD Descrição", placeholder="Ex: Notebook Dell")
@@ -326,7 +403,7 @@ def nova_compra_modal(cartao_id=None):
                 st.success("\u2705 Compra registrada com sucesso!")
                 
                 # Alertas pós-compra
-                novo_valor_usado = valor_usado + (valor / parcelas if parcelas > 1 else valor)
+                novo_valor_usado = valor_usado + valores_parcelas[0] / 100
                 novo_percentual = (novo_valor_usado / cartao_escolhido["limite"]) * 100
                 
                 if novo_percentual > 80:
@@ -342,9 +419,7 @@ def nova_compra_modal(cartao_id=None):
         if st.button("\U0001F6AB Cancelar", use_container_width=True):
             st.rerun()
 
-def view_transacoes_credito():
-    service = CartaoService()
-    cartoes = service.listar_cartoes()
+def view_transacoes_credito(service, cartoes):
     
     if not cartoes:
         st.info("Nenhum cartão cadastrado.")
@@ -354,16 +429,19 @@ def view_transacoes_credito():
     mes_ano = st.selectbox(
         "Filtrar por mês/ano",
         options=[hoje.strftime("%Y-%m")] + [
-            (hoje.replace(month=m)).strftime("%Y-%m") for m in range(1, 13)
+            (hoje.replace(day=1, month=m)).strftime("%Y-%m") for m in range(1, 13)
         ]
     )
 
-    todas_compras = []
-    for cartao in cartoes:
-        compras = service.listar_compras(cartao["_id"], mes_ano=mes_ano)
-        for compra in compras:
-            compra["Cartão"] = cartao["nome"]
-            todas_compras.append(compra)
+    # Uma única consulta para todos os cartões, já filtrada pelo mês no banco
+    nomes_cartoes = {cartao["_id"]: cartao["nome"] for cartao in cartoes}
+    todas_compras = service.listar_compras(
+        list(nomes_cartoes),
+        mes_ano=mes_ano,
+        projecao={"cartao_id": 1, "data_compra": 1, "descricao": 1, "categoria": 1, "valor": 1}
+    )
+    for compra in todas_compras:
+        compra["Cartão"] = nomes_cartoes[compra["cartao_id"]]
 
     if not todas_compras:
         st.info("Nenhuma transação encontrada para este período.")
@@ -378,7 +456,10 @@ def view_transacoes_credito():
         "valor": "Valor (R$)"
     }, inplace=True)
 
-    df["Valor (R$)"] = df["Valor (R$)"].apply(format_brl)
+    df["Data"] = df["Data"].map(lambda data: formatar_data(data, "%Y-%m-%d"))
+
+    # Formatação brasileira (1.381,86) aplicada à coluna inteira de uma vez
+    df["Valor (R$)"] = formatar_coluna_brl((df["Valor (R$)"] * 100).round().astype("int64"))
 
     st.subheader(f"Transações de Todos os Cartões ({mes_ano})")
     st.dataframe(df, use_container_width=True, hide_index=True, height=400)
@@ -1,20 +1,21 @@
 from services.objetivos_service import ObjetivosService
+from services.datas import para_datetime, formatar_data
+from services.formatacao import format_brl
+from auth.sessao import restaurar_sessao, encerrar_sessao
 import streamlit as st
 from datetime import datetime, timedelta
 
-def format_brl(valor):
-    """Formata número para padrão brasileiro: R$ 1.381,86"""
-    try:
-        return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
-
 def renderizar_objetivos():
 
     st.set_page_config(
     page_title="\U0001F3AF Objetivos Financeiros",
     layout="wide"
     )
+
+    # Sem sessão válida (nem token na URL), volta para a tela de login
+    if not restaurar_sessao():
+        st.switch_page("app.py")
+
     st.sidebar.markdown("### Navegação")
     st.sidebar.page_link("pages/transacao.py", label="\U0001F4CB Transações", icon=":material/list_alt:")
     st.sidebar.page_link("pages/objetivos.py", label="\U0001F3AF Objetivos", icon=":material/star:")
@@ -23,7 +24,7 @@ def renderizar_objetivos():
     st.sidebar.markdown("---")
     
     if st.sidebar.button("\U0001F6AA Sair", icon=":material/logout:"):
-        st.session_state.authenticated = False
+        encerrar_sessao()
         st.rerun()
     
     st.title("\U0001F3AF Meus Objetivos Financeiros")
@@ -65,7 +66,7 @@ def renderizar_objetivos():
                 st.metric(
                     f"{cor_prazo} Prazo",
                     f"{dias} dias",
-                    objetivo['prazo']
+                    formatar_data(objetivo['prazo'], "%Y-%m-%d")
                 )
             
             # Ações
@@ -78,10 +79,7 @@ def renderizar_objetivos():
                     editar_objetivo_modal(objetivo)
             with col_c:
                 if st.button(f"✅ Concluir", key=f"complete_{objetivo['_id']}"):
-                    service.colecao.update_one(
-                        {"_id": objetivo['_id']},
-                        {"$set": {"status": "concluido"}}
-                    )
+                    service.concluir_objetivo(objetivo['_id'])
                     st.success("Objetivo concluído! 🎉")
                     st.rerun()
 
@@ -210,10 +208,7 @@ def atualizar_objetivo_modal(objetivo):
                 st.success("\U0001F389 **PARABÉNS!** Você atingiu sua meta!")
                 
                 if st.button("\u2705 Marcar como Concluído", type="primary"):
-                    service.colecao.update_one(
-                        {"_id": objetivo['_id']},
-                        {"$set": {"status": "concluido"}}
-                    )
+                    service.concluir_objetivo(objetivo['_id'])
                     st.success("Objetivo marcado como concluído!")
             else:
                 st.success("\u2705 Progresso atualizado com sucesso!")
@@ -274,7 +269,7 @@ def editar_objetivo_modal(objetivo):
             key=f"edit_cat_{objetivo['_id']}"
         )
         
-        prazo_atual = datetime.strptime(objetivo['prazo'], "%Y-%m-%d").date()
+        prazo_atual = para_datetime(objetivo['prazo']).date()
         prazo = st.date_input(
             "\U0001F5D3 Data Limite",
             value=prazo_atual,
@@ -289,8 +284,8 @@ def editar_objetivo_modal(objetivo):
         mudancas.append(f"\U0001F48E Meta: {format_brl(objetivo['valor_meta'])} → {format_brl(valor_meta)}")
     if valor_atual != objetivo['valor_atual']:
         mudancas.append(f"\U0001F4B0 Atual: {format_brl(objetivo['valor_atual'])} → {format_brl(valor_atual)}")
-    if str(prazo) != objetivo['prazo']:
-        mudancas.append(f"\U0001F4C5 Prazo: {objetivo['prazo']} → {prazo}")
+    if prazo != prazo_atual:
+        mudancas.append(f"\U0001F4C5 Prazo: {prazo_atual} → {prazo}")
     
     if mudancas:
         st.markdown("**\U0001F504 Mudanças detectadas:**")
@@ -1,16 +1,19 @@
-from services.new_transacao import new_receita, new_despesa, quick_report
-from services.get_transacao import get_transacao
+from services.new_transacao import new_receita, new_despesa, quick_report, importar_extrato_dialog, exportar_dialog
+from services.get_transacao import get_pagina_transacoes, registrar_memoria, memoria_sessao, TAMANHOS_PAGINA
+from services.resumo_mensal import get_resumo_mensal
+from services.formatacao import format_brl, formatar_coluna_brl
+from services.frame_transacoes import get_frame_transacoes
+from services.criar_grafic import figura_em_cache, opcoes_serie_temporal
 import pandas as pd
+import numpy as np
+from auth.sessao import restaurar_sessao, encerrar_sessao
 import streamlit as st
 from datetime import datetime, timedelta
 import plotly.express as px
 
-def format_brl(valor):
-    """Formata número para padrão brasileiro: R$ 1.381,86"""
-    try:
-        return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
+# Históricos de até tantos meses no resumo têm a evolução lida das transações do período,
+# em série diária ou semanal; históricos maiores usam o resumo mensal
+MESES_SERIE_DETALHADA = 3
 
 def main():
     st.set_page_config(
@@ -18,6 +21,10 @@ def main():
         page_title="Minhas Transações",
         page_icon="\U0001F4CB"
     )
+
+    # Sem sessão válida (nem token na URL), volta para a tela de login
+    if not restaurar_sessao():
+        st.switch_page("app.py")
     
     # Header da página
     col_h1, col_h2, col_h3 = st.columns([2, 2, 1])
@@ -38,6 +45,10 @@ def main():
     with col_h3:
         if st.button("\U0001F4CA Relatório", use_container_width=True):
             st.session_state.show_quick_report = not st.session_state.get('show_quick_report', False)
+        if st.button("\U0001F4E5 Importar", use_container_width=True):
+            importar_extrato_dialog()
+        if st.button("\U0001F4E4 Exportar", use_container_width=True):
+            exportar_dialog()
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -49,20 +60,24 @@ def main():
         with st.expander("\U0001F4CA Relatório Rápido", expanded=True):
             st.markdown(quick_report())
     
-    # Carrega e processa dados
-    df = get_transacao()
+    # Métricas e gráficos vêm do resumo mensal: o custo depende do número de meses,
+    # não do número de transações do histórico
+    user_email = st.session_state.get("user_email", "")
+    resumo = get_resumo_mensal(user_email)
+    registrar_memoria("resumo_mensal", resumo)
+    st.sidebar.caption(f"Memória da sessão: {memoria_sessao() / 1024:.0f} KB")
     
     # Métricas do período filtrado
-    render_metricas_periodo(df)
+    render_metricas_periodo(resumo)
     
     st.markdown("---")
     # Visualizações
-    render_visualizacoes(df)
+    render_visualizacoes(user_email, resumo)
     
     st.markdown("---")
     
-    # Tabela de transações melhorada
-    render_tabela_transacoes(df)
+    # Tabela de transações paginada no banco
+    render_tabela_transacoes(user_email, resumo)
 
 def setup_sidebar():
     """Sidebar melhorada para transações"""
@@ -81,22 +96,20 @@ def setup_sidebar():
     st.sidebar.markdown("---")
     
     if st.sidebar.button("\U0001F6AA Sair", icon=":material/logout:"):
-        st.session_state.authenticated = False
+        encerrar_sessao()
         st.rerun()
 
-def render_metricas_periodo(df):
+def render_metricas_periodo(resumo):
     """Métricas do período filtrado"""
-    if df.empty:
+    if resumo.empty:
         st.warning("\U0001F4CA Nenhuma transação encontrada com os filtros aplicados")
         return
     
-    df_numeric = df.copy()
-    df_numeric["Valor R$"] = pd.to_numeric(df_numeric["Valor R$"], errors='coerce')
-    
-    receitas = df_numeric[df_numeric["Categoria Principal"] == "Receita"]["Valor R$"].sum()
-    despesas = df_numeric[df_numeric["Categoria Principal"] == "Despesa"]["Valor R$"].sum()
+    totais = resumo.groupby("Categoria Principal")["Centavos"].sum()
+    receitas = totais.get("Receita", 0) / 100
+    despesas = totais.get("Despesa", 0) / 100
     saldo = receitas - despesas
-    transacoes_count = len(df)
+    transacoes_count = int(resumo["Quantidade"].sum())
     
     col_m1, col_m2, col_m3, col_m4 = st.columns(4)
     
@@ -114,83 +127,129 @@ def render_metricas_periodo(df):
         st.metric("\U0001F4B0 Saldo Período", format_brl(saldo), delta_color=delta_color)
 
 
-def render_visualizacoes(df):
+def render_visualizacoes(user_email, resumo):
     """Visualizações das transações"""
-    if df.empty:
+    if resumo.empty:
         return
     
     st.markdown("### \U0001F4C8 Visualizações")
     
-    df_numeric = df.copy()
-    df_numeric["Valor R$"] = pd.to_numeric(df_numeric["Valor R$"], errors='coerce')
-    df_numeric['Data'] = pd.to_datetime(df_numeric['Data'], format='%d/%m/%Y', errors='coerce')
-    
     col_v1, col_v2 = st.columns(2)
     
     with col_v1:
         # Gráfico pizza por subcategoria (só despesas)
-        despesas = df_numeric[df_numeric["Categoria Principal"] == "Despesa"]
-        if not despesas.empty:
-            gastos_por_sub = despesas.groupby("Subcategoria")["Valor R$"].sum().sort_values(ascending=False)
-            
-            fig_pizza = px.pie(
-                values=gastos_por_sub.values,
-                names=gastos_por_sub.index,
-                title="\U0001F4B8 Despesas por Categoria",
-                color_discrete_sequence=px.colors.qualitative.Set3
+        if (resumo["Categoria Principal"] == "Despesa").any():
+            st.plotly_chart(
+                figura_em_cache("pizza_despesas", resumo, _figura_pizza_despesas),
+                use_container_width=True
             )
-            
-            fig_pizza.update_traces(textposition='inside', textinfo='percent+label')
-            fig_pizza.update_layout(showlegend=True, height=400)
-            
-            st.plotly_chart(fig_pizza, use_container_width=True)
     
     with col_v2:
         # Gráfico de evolução temporal
-        df_tempo = df_numeric.groupby(['Data', 'Categoria Principal'])['Valor R$'].sum().reset_index()
-        
-        if not df_tempo.empty:
-            fig_linha = px.line(
-                df_tempo,
-                x='Data',
-                y='Valor R$',
-                color='Categoria Principal',
-                title='\U0001F4CA Evolução Temporal',
-                color_discrete_map={'Receita': '#27ae60', 'Despesa': '#e74c3c'},
-                markers=True
-            )
-            
-            fig_linha.update_layout(
-                hovermode='x unified',
-                height=400,
-                showlegend=True
-            )
-            
-            st.plotly_chart(fig_linha, use_container_width=True)
+        frame = _frame_historico_curto(user_email, resumo)
+        if frame is not None and not frame.empty:
+            figura = figura_em_cache("evolucao_detalhada", frame, _figura_evolucao_detalhada)
+        else:
+            figura = figura_em_cache("evolucao_temporal", resumo, _figura_evolucao_temporal)
+        st.plotly_chart(figura, use_container_width=True)
 
-def render_tabela_transacoes(df):
-    """Tabela de transações melhorada"""
-    if df.empty:
-        return
+def _figura_pizza_despesas(resumo):
+    despesas = resumo[resumo["Categoria Principal"] == "Despesa"]
+    gastos_por_sub = despesas.groupby("Subcategoria")["Centavos"].sum().sort_values(ascending=False) / 100
+    
+    fig_pizza = px.pie(
+        values=gastos_por_sub.values,
+        names=gastos_por_sub.index,
+        title="\U0001F4B8 Despesas por Categoria",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
     
+    fig_pizza.update_traces(textposition='inside', textinfo='percent+label')
+    fig_pizza.update_layout(showlegend=True, height=400)
+    return fig_pizza
+
+def _frame_historico_curto(user_email, resumo):
+    """Transações dos meses do resumo quando são poucos; None para históricos maiores"""
+    meses = sorted(resumo["AnoMes"].unique())
+    if len(meses) > MESES_SERIE_DETALHADA:
+        return None
+    
+    ano, mes = map(int, meses[0].split("-"))
+    inicio = datetime(ano, mes, 1)
+    ano, mes = map(int, meses[-1].split("-"))
+    fim = datetime(ano + mes // 12, mes % 12 + 1, 1)
+    return get_frame_transacoes(user_email, inicio, fim)
+
+def _figura_evolucao_detalhada(frame):
+    # Série diária ou semanal, pelo intervalo de datas das transações
+    df_tempo, rotulo = frame.serie_temporal()
+    return _figura_linha_evolucao(df_tempo, rotulo)
+
+def _figura_evolucao_temporal(resumo):
+    # Série mensal do resumo: um ponto por mês e categoria
+    df_tempo = resumo.groupby(["AnoMes", "Categoria Principal"], as_index=False)["Centavos"].sum()
+    df_tempo["Data"] = pd.to_datetime(df_tempo["AnoMes"] + "-01")
+    df_tempo["Valor R$"] = df_tempo["Centavos"] / 100
+    return _figura_linha_evolucao(df_tempo, "Mensal")
+
+def _figura_linha_evolucao(df_tempo, rotulo):
+    fig_linha = px.line(
+        df_tempo,
+        x='Data',
+        y='Valor R$',
+        color='Categoria Principal',
+        title=f'\U0001F4CA Evolução Temporal ({rotulo})',
+        color_discrete_map={'Receita': '#27ae60', 'Despesa': '#e74c3c'},
+        **opcoes_serie_temporal(rotulo)
+    )
+    
+    fig_linha.update_layout(
+        hovermode='x unified',
+        height=400,
+        showlegend=True
+    )
+    return fig_linha
+
+def render_tabela_transacoes(user_email, resumo):
+    """Tabela de transações paginada no banco"""
     st.markdown("### \U0001F4CB Lista de Transações")
     
-    # Preparar dados para exibição
-    df_display = df.copy()
-    df_display["Valor R$"] = pd.to_numeric(df_display["Valor R$"], errors='coerce')
+    # Meses com transações, a partir do resumo mensal (sem percorrer as transações)
+    meses = sorted(resumo["AnoMes"].unique(), reverse=True) if not resumo.empty else []
     
-    df_display["Valor Formatado"] = df_display.apply(lambda row: 
-        f"\U0001F49A +{format_brl(row['Valor R$'])}" if row['Categoria Principal'] == 'Receita' 
-        else f"\U0001F4B8 -{format_brl(row['Valor R$'])}", axis=1)
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        mes = st.selectbox("\U0001F4C5 Ir para o mês", ["Mais recentes"] + meses)
+    with col_f2:
+        tamanho = st.selectbox("\U0001F4C4 Transações por página", TAMANHOS_PAGINA, index=1)
     
-    # Ordenar por data (mais recente primeiro)
-    df_display['Data'] = pd.to_datetime(df_display['Data'], format='%d/%m/%Y', errors='coerce')
-    df_display = df_display.sort_values('Data', ascending=False)
-    df_display['Data'] = df_display['Data'].dt.strftime('%d/%m/%Y')
+    # Trocar o mês ou o tamanho volta para a primeira página
+    if st.session_state.get("pagina_filtro") != (mes, tamanho):
+        st.session_state.pagina_filtro = (mes, tamanho)
+        st.session_state.pagina_cursores = [None]
+    cursores = st.session_state.pagina_cursores
     
-    # Selecionar colunas para exibir
-    colunas_exibir = ['Data', 'Descrição', 'Subcategoria', 'Valor Formatado']
-    df_final = df_display[colunas_exibir].reset_index(drop=True)
+    antes_de = None
+    if mes != "Mais recentes":
+        ano, numero_mes = map(int, mes.split("-"))
+        antes_de = datetime(ano + numero_mes // 12, numero_mes % 12 + 1, 1)
+    
+    df, proximo = get_pagina_transacoes(user_email, tamanho, depois_de=cursores[-1], antes_de=antes_de)
+    
+    if df.empty:
+        st.info("Nenhuma transação encontrada")
+        return
+    
+    # Preparar dados para exibição (a página já vem ordenada da mais recente para a mais antiga)
+    df_final = pd.DataFrame({
+        'Data': df['Data'].dt.strftime('%d/%m/%Y'),
+        'Descrição': df['Descrição'],
+        'Subcategoria': df['Subcategoria'],
+        'Valor Formatado': formatar_coluna_brl(
+            df['Centavos'],
+            sinais=np.where(df['Categoria Principal'] == 'Receita', "\U0001F49A +", "\U0001F4B8 -")
+        )
+    })
     
     # Renomear colunas
     df_final.columns = ['\U0001F4C5 Data', '\U0001F4DD Descrição', '\U0001F3F7 Categoria', '\U0001F4B0 Valor']
@@ -208,6 +267,18 @@ def render_tabela_transacoes(df):
             "\U0001F4B0 Valor": st.column_config.TextColumn(width="small"),
         }
     )
+    
+    col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+    with col_p1:
+        if st.button("\u2B05 Anterior", disabled=len(cursores) == 1, use_container_width=True):
+            cursores.pop()
+            st.rerun()
+    with col_p2:
+        st.caption(f"Página {len(cursores)}")
+    with col_p3:
+        if st.button("Próxima \u27A1", disabled=proximo is None, use_container_width=True):
+            cursores.append(proximo)
+            st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+import streamlit as st
+import functools
+import threading
+import inspect
+import time
+import copy
+
+# Cache em memória compartilhado pelas sessões do processo. Cada entrada guarda as versões
+# das coleções de que depende; uma escrita incrementa a versão e a entrada deixa de ser usada.
+_lock = threading.RLock()
+_versoes = {}  # (user_email ou None, coleção) -> versão
+_entradas = OrderedDict()  # chave -> (criado_em, valor)
+# Chamadas em cache em andamento nesta thread, da mais externa para a mais interna
+_chamadas = threading.local()
+
+
+def _config(chave, padrao):
+    """Lê uma configuração opcional do secrets.toml"""
+    try:
+        return st.secrets.get(chave, padrao)
+    except Exception:
+        return padrao
+
+
+MAX_ENTRADAS = int(_config("CACHE_MAX_ENTRADAS", 512))
+# Rede de segurança para escritas feitas fora deste processo
+TTL_SEGUNDOS = float(_config("CACHE_TTL_SEGUNDOS", 300))
+
+
+def usuario_atual():
+    """E-mail do usuário da sessão atual"""
+    return st.session_state.get("user_email", "")
+
+
+def _versoes_atuais(user_email, colecoes):
+    """Versões das coleções para o usuário (inclui invalidações globais)"""
+    return tuple(
+        (_versoes.get((user_email, colecao), 0), _versoes.get((None, colecao), 0))
+        for colecao in colecoes
+    )
+
+
+def _congelar(valor):
+    """Converte argumentos em uma chave hashable"""
+    if isinstance(valor, dict):
+        return tuple(sorted((chave, _congelar(item)) for chave, item in valor.items()))
+    if isinstance(valor, (list, tuple, set)):
+        return tuple(_congelar(item) for item in valor)
+    hash(valor)
+    return valor
+
+
+def invalidar(user_email, *colecoes):
+    """Marca as coleções como alteradas para o usuário (None invalida todos os usuários)"""
+    with _lock:
+        for colecao in colecoes:
+            _versoes[(user_email, colecao)] = _versoes.get((user_email, colecao), 0) + 1
+
+        # Libera a memória das entradas que não serão mais usadas
+        obsoletas = [
+            chave for chave in _entradas
+            if (user_email is None or chave[1] == user_email) and set(chave[2]) & set(colecoes)
+        ]
+        for chave in obsoletas:
+            del _entradas[chave]
+
+
+def sem_cache(valor):
+    """Marca o resultado de um caminho de erro para não ser guardado (nem pelas chamadas externas)"""
+    for chamada in getattr(_chamadas, "pilha", []):
+        chamada["erro"] = True
+    return valor
+
+
+def limpar():
+    """Remove todas as entradas do cache"""
+    with _lock:
+        _entradas.clear()
+
+
+def em_cache(*colecoes, copiar=True):
+    """Guarda o resultado da função por usuário até a próxima escrita nas coleções indicadas"""
+    def decorador(funcao):
+        eh_metodo = next(iter(inspect.signature(funcao).parameters), None) == "self"
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            user_email = usuario_atual()
+            try:
+                chave = (
+                    funcao.__qualname__,
+                    user_email,
+                    colecoes,
+                    _versoes_atuais(user_email, colecoes),
+                    _congelar(args[1:] if eh_metodo else args),
+                    _congelar(kwargs)
+                )
+            except TypeError:
+                # Argumentos não hashable: executa sem cache
+                return funcao(*args, **kwargs)
+
+            with _lock:
+                entrada = _entradas.get(chave)
+                if entrada and time.monotonic() - entrada[0] < TTL_SEGUNDOS:
+                    _entradas.move_to_end(chave)
+                    return copy.deepcopy(entrada[1]) if copiar else entrada[1]
+
+            pilha = _chamadas.__dict__.setdefault("pilha", [])
+            chamada = {"erro": False}
+            pilha.append(chamada)
+            try:
+                valor = funcao(*args, **kwargs)
+            finally:
+                pilha.pop()
+
+            # Resultado de erro (ex.: lista vazia após falha no banco): a próxima chamada tenta de novo
+            if chamada["erro"]:
+                return valor
+
+            with _lock:
+                _entradas[chave] = (time.monotonic(), valor)
+                _entradas.move_to_end(chave)
+                while len(_entradas) > MAX_ENTRADAS:
+                    _entradas.popitem(last=False)
+
+            return copy.deepcopy(valor) if copiar else valor
+
+        return wrapper
+    return decorador
@@ -1,7 +1,76 @@
 import streamlit as st
-from datetime import datetime, timedelta, date
+from datetime import datetime
 from config.db_config import connect_db
-import pandas as pd
+from services.datas import para_datetime, para_data_bson
+from services.dinheiro import para_centavos, centavos, reais, em_reais, dividir_parcelas, expressao_centavos
+from services.cache import em_cache, sem_cache, invalidar, usuario_atual
+from calendar import monthrange
+
+
+def mes_fatura(data, dia_fechamento):
+    """Mês (YYYY-mm) da fatura em que cai uma data, conforme o dia de fechamento"""
+    ano, mes = data.year, data.month
+    
+    # Meses mais curtos fecham no último dia
+    if data.day > min(dia_fechamento, monthrange(ano, mes)[1]):
+        ano, mes = (ano, mes + 1) if mes < 12 else (ano + 1, 1)
+    
+    return f"{ano:04d}-{mes:02d}"
+
+
+def somar_meses(ano_mes, meses):
+    """Avança um mês no formato YYYY-mm"""
+    ano, mes = map(int, ano_mes.split("-"))
+    indice = ano * 12 + (mes - 1) + meses
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def gerar_parcelas(compra, dia_fechamento):
+    """Expande uma compra em uma entrada por parcela, na fatura de cada mês"""
+    total_parcelas = int(compra.get("parcelas", 1))
+    valores = dividir_parcelas(centavos(compra["valor"]), total_parcelas)
+    data_compra = para_datetime(compra["data_compra"])
+    primeira_fatura = mes_fatura(data_compra, dia_fechamento)
+    
+    return [
+        {
+            "user_email": compra.get("user_email", ""),
+            "cartao_id": compra["cartao_id"],
+            "compra_id": compra["_id"],
+            "numero": numero,
+            "total_parcelas": total_parcelas,
+            "valor": valores[numero - 1],
+            "mes_fatura": somar_meses(primeira_fatura, numero - 1),
+            "data_compra": data_compra,
+            "descricao": compra["descricao"],
+            "categoria": compra["categoria"]
+        }
+        for numero in range(1, total_parcelas + 1)
+    ]
+
+
+def reconstruir_parcelas(db, cartao, tamanho_lote=500):
+    """Recria as parcelas de todas as compras de um cartão e descarta as faturas congeladas"""
+    colecao_parcelas = db.get_collection("parcelas_cartao")
+    colecao_parcelas.delete_many({"cartao_id": cartao["_id"]})
+    # Faturas fechadas congeladas a partir das parcelas antigas (vazias ou incompletas) são refeitas
+    db.get_collection("faturas_cartao").delete_many({"cartao_id": cartao["_id"]})
+    
+    total = 0
+    lote = []
+    for compra in db.get_collection("compras_cartao").find({"cartao_id": cartao["_id"]}):
+        lote.extend(gerar_parcelas(compra, cartao["dia_fechamento"]))
+        if len(lote) >= tamanho_lote:
+            colecao_parcelas.insert_many(lote)
+            total += len(lote)
+            lote = []
+    
+    if lote:
+        colecao_parcelas.insert_many(lote)
+        total += len(lote)
+    
+    return total
+
 
 class CartaoService:
     def __init__(self):
@@ -9,6 +78,7 @@ class CartaoService:
         self.colecao = self.db.get_collection("cartoes")
         self.colecao_faturas = self.db.get_collection("faturas_cartao")
         self.colecao_compras = self.db.get_collection("compras_cartao")
+        self.colecao_parcelas = self.db.get_collection("parcelas_cartao")
     
     def criar_cartao(self, dados_cartao: dict):
         """Cria um novo cartão de crédito"""
@@ -18,7 +88,7 @@ class CartaoService:
                 "nome": dados_cartao["nome"],
                 "bandeira": dados_cartao["bandeira"],
                 "banco": dados_cartao["banco"],
-                "limite": float(dados_cartao["limite"]),
+                "limite": para_centavos(dados_cartao["limite"]),
                 "dia_vencimento": int(dados_cartao["dia_vencimento"]),
                 "dia_fechamento": int(dados_cartao["dia_fechamento"]),
                 "ativo": True,
@@ -26,14 +96,16 @@ class CartaoService:
             }
             
             result = self.colecao.insert_one(cartao)
+            invalidar(cartao["user_email"], "cartoes")
             return result.inserted_id is not None
             
         except Exception as e:
             st.error(f"Erro ao criar cartão: {str(e)}")
             return False
     
+    @em_cache("cartoes")
     def listar_cartoes(self, apenas_ativos=True):
-        """Lista cartões do usuário"""
+        """Lista cartões do usuário (limite em reais)"""
         try:
             user_email = st.session_state.get("user_email", "")
             filtro = {"user_email": user_email}
@@ -42,148 +114,276 @@ class CartaoService:
                 filtro["ativo"] = True
             
             cartoes = list(self.colecao.find(filtro).sort("nome", 1))
-            return cartoes
+            return [em_reais(cartao, "limite") for cartao in cartoes]
             
         except Exception as e:
             st.error(f"Erro ao listar cartões: {str(e)}")
-            return []
+            return sem_cache([])
     
+    @em_cache("cartoes")
     def get_cartao(self, cartao_id):
-        """Busca cartão por ID"""
+        """Busca cartão por ID (limite em reais)"""
         try:
-            return self.colecao.find_one({"_id": cartao_id})
+            cartao = self.colecao.find_one({"_id": cartao_id})
+            return em_reais(cartao, "limite") if cartao else None
         except Exception as e:
             st.error(f"Erro ao buscar cartão: {str(e)}")
-            return None
+            return sem_cache(None)
     
     def adicionar_compra(self, dados_compra: dict):
         """Adiciona uma compra no cartão"""
         try:
+            cartao = self.get_cartao(dados_compra["cartao_id"])
+            if not cartao:
+                st.error("Cartão não encontrado")
+                return False
+            
+            valor = para_centavos(dados_compra["valor"])
+            total_parcelas = int(dados_compra.get("parcelas", 1))
+            
             compra = {
                 "user_email": st.session_state.get("user_email", ""),
                 "cartao_id": dados_compra["cartao_id"],
                 "descricao": dados_compra["descricao"],
-                "valor": float(dados_compra["valor"]),
+                "valor": valor,
                 "categoria": dados_compra["categoria"],
-                "data_compra": dados_compra["data_compra"].strftime("%Y-%m-%d"),
-                "parcelas": int(dados_compra.get("parcelas", 1)),
-                "valor_parcela": float(dados_compra["valor"]) / int(dados_compra.get("parcelas", 1)),
+                "data_compra": para_data_bson(dados_compra["data_compra"]),
+                "parcelas": total_parcelas,
+                # Parcela regular; o resto da divisão entra na primeira
+                "valor_parcela": valor // total_parcelas,
                 "data_criacao": datetime.now().isoformat()
             }
             
             result = self.colecao_compras.insert_one(compra)
-            return result.inserted_id is not None
+            if result.inserted_id is None:
+                return False
+            
+            parcelas = gerar_parcelas(compra, cartao["dia_fechamento"])
+            self.colecao_parcelas.insert_many(parcelas)
+            invalidar(compra["user_email"], "compras_cartao")
+            
+            # Compra retroativa altera faturas já fechadas
+            mes_aberto = self.mes_fatura_atual(cartao["dia_fechamento"])
+            meses_fechados = {p["mes_fatura"] for p in parcelas if p["mes_fatura"] < mes_aberto}
+            if meses_fechados:
+                self._descartar_faturas_fechadas(cartao["_id"], meses_fechados)
+            return True
             
         except Exception as e:
             st.error(f"Erro ao adicionar compra: {str(e)}")
             return False
     
-    def listar_compras(self, cartao_id=None, mes_ano=None):
-        """Lista compras do cartão"""
+    @em_cache("compras_cartao")
+    def listar_compras(self, cartao_id=None, mes_ano=None, inicio=None, fim=None,
+                       limite=0, pular=0, projecao=None):
+        """Lista compras do cartão (ou de uma lista de cartões) no período [inicio, fim), valores em reais"""
         try:
             user_email = st.session_state.get("user_email", "")
             filtro = {"user_email": user_email}
             
-            if cartao_id:
+            if isinstance(cartao_id, list):
+                filtro["cartao_id"] = {"$in": cartao_id}
+            elif cartao_id:
                 filtro["cartao_id"] = cartao_id
             
-            compras = list(self.colecao_compras.find(filtro).sort("data_compra", -1))
-            
             if mes_ano:
                 # Filtrar por mês/ano específico
-                compras_filtradas = []
-                for compra in compras:
-                    data_compra = datetime.strptime(compra["data_compra"], "%Y-%m-%d")
-                    if data_compra.strftime("%Y-%m") == mes_ano:
-                        compras_filtradas.append(compra)
-                return compras_filtradas
-            
-            return compras
+                ano, mes = map(int, mes_ano.split("-"))
+                inicio = datetime(ano, mes, 1)
+                fim = datetime(ano + mes // 12, mes % 12 + 1, 1)
+            
+            if inicio or fim:
+                periodo, periodo_texto = {}, {}
+                if inicio:
+                    periodo["$gte"] = para_datetime(inicio)
+                    periodo_texto["$gte"] = periodo["$gte"].strftime("%Y-%m-%d")
+                if fim:
+                    periodo["$lt"] = para_datetime(fim)
+                    periodo_texto["$lt"] = periodo["$lt"].strftime("%Y-%m-%d")
+                # Datas ainda em texto (YYYY-mm-dd) são comparáveis como texto
+                filtro["$or"] = [{"data_compra": periodo}, {"data_compra": periodo_texto}]
+            
+            cursor = self.colecao_compras.find(filtro, projecao).sort("data_compra", -1)
+            return [em_reais(compra, "valor", "valor_parcela") for compra in cursor.skip(pular).limit(limite)]
             
         except Exception as e:
             st.error(f"Erro ao listar compras: {str(e)}")
-            return []
+            return sem_cache([])
     
-    def calcular_fatura_atual(self, cartao_id):
-        """Calcula o valor da fatura atual do cartão"""
+    def mes_fatura_atual(self, dia_fechamento, hoje=None):
+        """Mês (YYYY-mm) da fatura ainda aberta do cartão"""
+        return mes_fatura(hoje or datetime.now(), dia_fechamento)
+    
+    @em_cache("cartoes", "compras_cartao")
+    def calcular_faturas_atuais(self, cartoes):
+        """Calcula a fatura atual de vários cartões em uma única agregação"""
         try:
-            cartao = self.get_cartao(cartao_id)
-            if not cartao:
-                return 0.0
+            if not cartoes:
+                return {}
             
             hoje = datetime.now()
-            dia_fechamento = cartao["dia_fechamento"]
-            
-            # Determinar período da fatura atual
-            if hoje.day <= dia_fechamento:
-                # Fatura atual: mês anterior até hoje
-                inicio_periodo = (hoje.replace(day=dia_fechamento) - timedelta(days=30)).replace(day=dia_fechamento+1)
-            else:
-                # Fatura atual: dia do fechamento até hoje
-                inicio_periodo = hoje.replace(day=dia_fechamento+1)
-            
-            # Buscar compras do período
-            compras = self.listar_compras(cartao_id)
-            total_fatura = 0.0
-            
-            for compra in compras:
-                data_compra = datetime.strptime(compra["data_compra"], "%Y-%m-%d")
-                
-                if data_compra >= inicio_periodo and data_compra <= hoje:
-                    # Se for parcelado, considera apenas uma parcela
-                    if compra["parcelas"] > 1:
-                        total_fatura += compra["valor_parcela"]
-                    else:
-                        total_fatura += compra["valor"]
+            meses = {c["_id"]: self.mes_fatura_atual(c["dia_fechamento"], hoje) for c in cartoes}
+            
+            # Soma as parcelas que caem na fatura aberta de cada cartão
+            pipeline = [
+                {"$match": {
+                    "user_email": st.session_state.get("user_email", ""),
+                    "$or": [
+                        {"cartao_id": cartao_id, "mes_fatura": mes}
+                        for cartao_id, mes in meses.items()
+                    ]
+                }},
+                {"$group": {"_id": "$cartao_id", "total": {"$sum": expressao_centavos("valor")}}}
+            ]
+            
+            faturas = {cartao_id: 0.0 for cartao_id in meses}
+            for grupo in self.colecao_parcelas.aggregate(pipeline):
+                faturas[grupo["_id"]] = reais(grupo["total"])
+            
+            return faturas
+            
+        except Exception as e:
+            st.error(f"Erro ao calcular faturas: {str(e)}")
+            return sem_cache({c["_id"]: 0.0 for c in cartoes})
+    
+    @em_cache("cartoes", "compras_cartao")
+    def listar_compromissos_futuros(self, cartoes):
+        """Soma as parcelas das faturas seguintes à atual, por cartão e mês"""
+        try:
+            if not cartoes:
+                return {}
             
-            return total_fatura
+            hoje = datetime.now()
+            pipeline = [
+                {"$match": {
+                    "user_email": st.session_state.get("user_email", ""),
+                    "$or": [
+                        {"cartao_id": c["_id"], "mes_fatura": {"$gt": self.mes_fatura_atual(c["dia_fechamento"], hoje)}}
+                        for c in cartoes
+                    ]
+                }},
+                {"$group": {
+                    "_id": {"cartao_id": "$cartao_id", "mes_fatura": "$mes_fatura"},
+                    "total": {"$sum": expressao_centavos("valor")}
+                }},
+                {"$sort": {"_id.mes_fatura": 1}}
+            ]
+            
+            compromissos = {c["_id"]: {} for c in cartoes}
+            for grupo in self.colecao_parcelas.aggregate(pipeline):
+                compromissos[grupo["_id"]["cartao_id"]][grupo["_id"]["mes_fatura"]] = reais(grupo["total"])
+            
+            return compromissos
             
         except Exception as e:
-            st.error(f"Erro ao calcular fatura: {str(e)}")
+            st.error(f"Erro ao calcular compromissos futuros: {str(e)}")
+            return sem_cache({c["_id"]: {} for c in cartoes})
+    
+    def calcular_fatura_atual(self, cartao_id):
+        """Calcula o valor da fatura atual do cartão"""
+        cartao = self.get_cartao(cartao_id)
+        if not cartao:
             return 0.0
+        
+        return self.calcular_faturas_atuais([cartao]).get(cartao_id, 0.0)
     
+    def _calcular_fatura(self, cartao, mes_ano):
+        """Monta o resumo de uma fatura a partir das parcelas do mês (valores em centavos)"""
+        parcelas = list(self.colecao_parcelas.find({
+            "user_email": st.session_state.get("user_email", ""),
+            "cartao_id": cartao["_id"],
+            "mes_fatura": mes_ano
+        }).sort("data_compra", -1))
+        
+        if not parcelas:
+            return None
+        
+        itens = [
+            {
+                "descricao": parcela["descricao"],
+                "categoria": parcela["categoria"],
+                "valor": centavos(parcela["valor"]),
+                "data": parcela["data_compra"],
+                "parcela": parcela["numero"],
+                "parcelas": parcela["total_parcelas"]
+            }
+            for parcela in parcelas
+        ]
+        
+        totais_categorias = {}
+        for item in itens:
+            totais_categorias[item["categoria"]] = totais_categorias.get(item["categoria"], 0) + item["valor"]
+        
+        return {
+            "user_email": cartao.get("user_email", ""),
+            "cartao_id": cartao["_id"],
+            "mes_ano": mes_ano,
+            "total": sum(item["valor"] for item in itens),
+            "limite": centavos(cartao["limite"]),
+            # Lista em vez de dicionário: categorias podem conter caracteres inválidos em chaves
+            "totais_categorias": [
+                {"categoria": categoria, "total": total}
+                for categoria, total in sorted(totais_categorias.items(), key=lambda c: -c[1])
+            ],
+            "itens": itens
+        }
+    
+    def _congelar_fatura(self, fatura):
+        """Grava a fatura de um ciclo fechado; uma fatura já gravada nunca é sobrescrita"""
+        self.colecao_faturas.update_one(
+            {"cartao_id": fatura["cartao_id"], "mes_ano": fatura["mes_ano"]},
+            {"$setOnInsert": {**fatura, "fechada_em": datetime.now()}},
+            upsert=True
+        )
+    
+    def _descartar_faturas_fechadas(self, cartao_id, meses=None):
+        """Descarta faturas congeladas cujas parcelas mudaram (compras retroativas ou exclusões)"""
+        filtro = {"cartao_id": cartao_id}
+        if meses is not None:
+            filtro["mes_ano"] = {"$in": list(meses)}
+        self.colecao_faturas.delete_many(filtro)
+    
+    @em_cache("cartoes", "compras_cartao")
     def gerar_fatura(self, cartao_id, mes_ano):
-        """Gera fatura detalhada do cartão para um mês específico"""
+        """Gera fatura detalhada do cartão para um mês de fatura (YYYY-mm)"""
         try:
             cartao = self.get_cartao(cartao_id)
-            compras = self.listar_compras(cartao_id, mes_ano)
-            
-            if not cartao or not compras:
+            if not cartao:
                 return None
             
-            # Agrupar compras por categoria
+            fechada = mes_ano < self.mes_fatura_atual(cartao["dia_fechamento"])
+            
+            # Ciclos fechados são lidos da fatura congelada; só o ciclo aberto é calculado
+            fatura = self.colecao_faturas.find_one({"cartao_id": cartao_id, "mes_ano": mes_ano}) if fechada else None
+            if fatura is None:
+                fatura = self._calcular_fatura(cartao, mes_ano)
+                if fatura is None:
+                    return None
+                if fechada:
+                    self._congelar_fatura(fatura)
+            
+            # Agrupar itens por categoria (faturas congeladas antes da migração ainda estão em reais)
             categorias = {}
-            total_fatura = 0.0
-            
-            for compra in compras:
-                categoria = compra["categoria"]
-                valor = compra["valor_parcela"] if compra["parcelas"] > 1 else compra["valor"]
-                
-                if categoria not in categorias:
-                    categorias[categoria] = []
-                
-                categorias[categoria].append({
-                    "descricao": compra["descricao"],
-                    "valor": valor,
-                    "data": compra["data_compra"],
-                    "estabelecimento": compra.get("estabelecimento", ""),
-                    "parcelas": compra["parcelas"]
-                })
-                
-                total_fatura += valor
+            for item in fatura["itens"]:
+                categorias.setdefault(item["categoria"], []).append(em_reais(item, "valor"))
+            
+            total_fatura = reais(fatura["total"])
+            limite = reais(fatura["limite"])
             
             return {
                 "cartao": cartao,
                 "mes_ano": mes_ano,
+                "fechada": fechada,
                 "categorias": categorias,
+                "totais_categorias": {c["categoria"]: reais(c["total"]) for c in fatura["totais_categorias"]},
                 "total": total_fatura,
-                "limite_disponivel": cartao["limite"] - total_fatura,
-                "percentual_usado": (total_fatura / cartao["limite"]) * 100 if cartao["limite"] > 0 else 0
+                "limite_disponivel": limite - total_fatura,
+                "percentual_usado": (total_fatura / limite) * 100 if limite > 0 else 0
             }
             
         except Exception as e:
             st.error(f"Erro ao gerar fatura: {str(e)}")
-            return None
+            return sem_cache(None)
     
     def atualizar_cartao(self, cartao_id, dados_atualizados):
         """Atualiza dados do cartão"""
@@ -196,7 +396,7 @@ class CartaoService:
             for campo in campos_permitidos:
                 if campo in dados_atualizados:
                     if campo in ["limite"]:
-                        update_data[campo] = float(dados_atualizados[campo])
+                        update_data[campo] = para_centavos(dados_atualizados[campo])
                     elif campo in ["dia_vencimento", "dia_fechamento"]:
                         update_data[campo] = int(dados_atualizados[campo])
                     else:
@@ -207,6 +407,12 @@ class CartaoService:
                 {"$set": update_data}
             )
             
+            # Mudança no fechamento desloca as parcelas entre faturas
+            if "dia_fechamento" in update_data and result.modified_count > 0:
+                reconstruir_parcelas(self.db, self.colecao.find_one({"_id": cartao_id}))
+                self._descartar_faturas_fechadas(cartao_id)
+            
+            invalidar(usuario_atual(), "cartoes")
             return result.modified_count > 0
             
         except Exception as e:
@@ -216,7 +422,14 @@ class CartaoService:
     def excluir_compra(self, compra_id):
         """Exclui uma compra"""
         try:
+            compra = self.colecao_compras.find_one({"_id": compra_id}, {"cartao_id": 1})
+            meses = self.colecao_parcelas.distinct("mes_fatura", {"compra_id": compra_id})
+            
             result = self.colecao_compras.delete_one({"_id": compra_id})
+            self.colecao_parcelas.delete_many({"compra_id": compra_id})
+            if compra and meses:
+                self._descartar_faturas_fechadas(compra["cartao_id"], meses)
+            invalidar(usuario_atual(), "compras_cartao")
             return result.deleted_count > 0
         except Exception as e:
             st.error(f"Erro ao excluir compra: {str(e)}")
@@ -239,10 +452,11 @@ class CartaoService:
         except Exception as e:
             return 0
     
-    def get_estatisticas_cartoes(self):
+    def get_estatisticas_cartoes(self, cartoes=None, faturas=None):
         """Retorna estatísticas gerais dos cartões"""
         try:
-            cartoes = self.listar_cartoes()
+            if cartoes is None:
+                cartoes = self.listar_cartoes()
             
             if not cartoes:
                 return {
@@ -252,8 +466,11 @@ class CartaoService:
                     "limite_disponivel": 0
                 }
             
-            limite_total = sum(c["limite"] for c in cartoes)
-            valor_usado = sum(self.calcular_fatura_atual(c["_id"]) for c in cartoes)
+            if faturas is None:
+                faturas = self.calcular_faturas_atuais(cartoes)
+            
+            limite_total = reais(sum(centavos(c["limite"]) for c in cartoes))
+            valor_usado = reais(sum(para_centavos(faturas.get(c["_id"], 0)) for c in cartoes))
             
             return {
                 "total_cartoes": len(cartoes),
@@ -1,15 +1,58 @@
+from collections import OrderedDict
 import pandas as pd
 import plotly.express as px
 import streamlit as st
+import threading
+import hashlib
 
-def gerar_graficos(df: pd.DataFrame):
-    # Garantir tipo numérico e data
-    df["Valor R$"] = df["Valor R$"].astype(float)
-    df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y")
+# Figuras já montadas, por gráfico, conteúdo dos dados e opções. Cada rerun do Streamlit
+# (um clique, um diálogo aberto) reaproveita a figura enquanto os dados não mudarem.
+# Guarda o go.Figure, não um dict: st.plotly_chart só lê a figura, e um dict seria
+# validado de novo (go.Figure(**dict)) a cada rerun.
+MAX_FIGURAS = 64
+_figuras = OrderedDict()
+_lock = threading.Lock()
 
-    df_mes = df.copy()
-    df_mes["AnoMes"] = df_mes["Data"].dt.to_period("M").astype(str)
-    df_mes_group = df_mes.groupby(["AnoMes", "Categoria Principal"])["Valor R$"].sum().reset_index()
+
+def impressao_digital(df: pd.DataFrame):
+    """Hash do conteúdo de um DataFrame: valores, índice, colunas e tipos"""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(repr([(coluna, str(tipo)) for coluna, tipo in df.dtypes.items()]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def figura_em_cache(nome, dados, construir, **opcoes):
+    """Figura de `construir(dados, **opcoes)` reaproveitada entre reruns (não deve ser alterada)"""
+    # Um FrameTransacoes já traz o hash calculado; um DataFrame é hasheado aqui
+    digital = dados.impressao_digital if hasattr(dados, "impressao_digital") else impressao_digital(dados)
+    chave = (nome, digital, tuple(sorted(opcoes.items())))
+
+    with _lock:
+        if chave in _figuras:
+            _figuras.move_to_end(chave)
+            return _figuras[chave]
+
+    figura = construir(dados, **opcoes)
+
+    with _lock:
+        _figuras[chave] = figura
+        while len(_figuras) > MAX_FIGURAS:
+            _figuras.popitem(last=False)
+
+    return figura
+
+
+def opcoes_serie_temporal(rotulo):
+    """Séries reagrupadas são longas: traços WebGL e sem marcadores em cada ponto"""
+    if rotulo == "Diária":
+        return {"markers": True}
+    return {"markers": False, "render_mode": "webgl"}
+
+
+def _figura_barras_mensais(resumo: pd.DataFrame):
+    # Totais mensais já vêm somados do resumo mensal; somas em centavos, eixo em reais
+    df_mes_group = resumo.groupby(["AnoMes", "Categoria Principal"])["Centavos"].sum().reset_index()
+    df_mes_group["Valor R$"] = df_mes_group["Centavos"] / 100
 
     fig_barras = px.bar(
         df_mes_group,
@@ -29,16 +72,19 @@ def gerar_graficos(df: pd.DataFrame):
         yaxis=dict(showgrid=True, gridcolor="rgba(200,200,200,0.3)"),
         legend_title_text="Categoria",
     )
+    return fig_barras
+
 
-    df_diario = df.groupby(["Data", "Categoria Principal"])["Valor R$"].sum().reset_index()
+def _figura_evolucao_diaria(frame):
+    df_periodo, rotulo = frame.serie_temporal()
     fig_linha = px.line(
-        df_diario,
+        df_periodo,
         x="Data",
         y="Valor R$",
         color="Categoria Principal",
-        title="Evolução Diária de Receitas e Despesas",
+        title=f"Evolução {rotulo} de Receitas e Despesas",
         color_discrete_map={"Receita": "#2ecc71", "Despesa": "#e74c3c"},
-        markers=True
+        **opcoes_serie_temporal(rotulo)
     )
     fig_linha.update_layout(
         template="plotly_white",
@@ -49,9 +95,18 @@ def gerar_graficos(df: pd.DataFrame):
         yaxis=dict(showgrid=True, gridcolor="rgba(200,200,200,0.3)"),
         legend_title_text="Categoria",
     )
+    return fig_linha
+
 
+def gerar_graficos(frame, resumo: pd.DataFrame):
     col1, col2 = st.columns(2)
     with col1:
-        st.plotly_chart(fig_barras, use_container_width=True)
+        if resumo.empty:
+            st.info("\U0001F4CA Cadastre transações para ver o gráfico mensal")
+        else:
+            st.plotly_chart(figura_em_cache("barras_mensais", resumo, _figura_barras_mensais), use_container_width=True)
     with col2:
-        st.plotly_chart(fig_linha, use_container_width=True)
+        if frame.empty:
+            st.info("\U0001F4C8 Cadastre transações para ver a evolução")
+        else:
+            st.plotly_chart(figura_em_cache("evolucao_diaria", frame, _figura_evolucao_diaria), use_container_width=True)
@@ -0,0 +1,42 @@
+from datetime import datetime, date
+
+# Formatos em que as datas eram gravadas como texto antes da migração para datas BSON
+FORMATOS_LEGADOS = ("%d/%m/%Y", "%Y-%m-%d")
+
+
+def para_datetime(valor):
+    """Converte datas BSON ou textos legados para datetime (None se inválido)"""
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, datetime.min.time())
+    if isinstance(valor, str):
+        for formato in FORMATOS_LEGADOS:
+            try:
+                return datetime.strptime(valor, formato)
+            except ValueError:
+                continue
+    return None
+
+
+def para_data_bson(valor):
+    """Normaliza uma data do formulário para datetime à meia-noite, como gravado no banco"""
+    valor = para_datetime(valor)
+    return datetime.combine(valor.date(), datetime.min.time()) if valor else None
+
+
+def expressao_data_normalizada(campo, formato="%d/%m/%Y"):
+    """Expressão de agregação que converte o campo em data BSON quando ainda estiver em texto"""
+    return {
+        "$cond": [
+            {"$eq": [{"$type": f"${campo}"}, "string"]},
+            {"$dateFromString": {"dateString": f"${campo}", "format": formato, "onError": None}},
+            f"${campo}"
+        ]
+    }
+
+
+def formatar_data(valor, formato="%d/%m/%Y"):
+    """Formata datas em qualquer um dos formatos aceitos"""
+    valor = para_datetime(valor)
+    return valor.strftime(formato) if valor else ""
@@ -0,0 +1,46 @@
+from decimal import Decimal, ROUND_HALF_UP
+import numbers
+
+# Valores em dinheiro são gravados como centavos inteiros. Documentos antigos ainda podem
+# trazer reais em ponto flutuante: inteiro = centavos, float = reais (legado).
+
+
+def para_centavos(reais):
+    """Converte um valor em reais digitado no formulário para centavos inteiros"""
+    return int(Decimal(str(reais)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def centavos(valor):
+    """Centavos de um valor gravado no banco, aceitando reais legados em float"""
+    if valor is None:
+        return 0
+    if isinstance(valor, numbers.Integral) and not isinstance(valor, bool):
+        return int(valor)
+    return para_centavos(valor)
+
+
+def reais(valor):
+    """Valor gravado no banco em reais, para exibição"""
+    return centavos(valor) / 100
+
+
+def em_reais(documento, *campos):
+    """Cópia do documento com os campos de dinheiro em reais"""
+    return {**documento, **{campo: reais(documento[campo]) for campo in campos if campo in documento}}
+
+
+def dividir_parcelas(total, parcelas):
+    """Divide centavos em parcelas exatas; o resto da divisão vai para a primeira"""
+    base, resto = divmod(total, parcelas)
+    return [base + resto] + [base] * (parcelas - 1)
+
+
+def expressao_centavos(campo):
+    """Expressão de agregação que converte o campo em centavos quando ainda estiver em reais"""
+    return {
+        "$cond": [
+            {"$eq": [{"$type": f"${campo}"}, "double"]},
+            {"$toLong": {"$round": [{"$multiply": [f"${campo}", 100]}, 0]}},
+            f"${campo}"
+        ]
+    }
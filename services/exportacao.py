@@ -0,0 +1,209 @@
+from services.datas import para_datetime, formatar_data
+from services.dinheiro import centavos
+from pymongo import ASCENDING
+import argparse
+import csv
+import io
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+# Documentos por ida ao banco (batch_size do cursor) e linhas por bloco gravado no arquivo
+TAMANHO_LOTE = 5000
+
+FORMATOS = ["csv", "parquet"]
+
+# Maior arquivo entregue pelo botão de download (que o mantém em memória); acima disso, use o CLI
+LIMITE_DOWNLOAD = 50 * 1024 * 1024
+
+# Campos lidos por coleção, campo de data e campos de dinheiro (em centavos no banco)
+COLECOES_EXPORTACAO = {
+    "transacoes": {
+        "campos": ["data", "descricao", "categoria_principal", "subcategoria", "valor"],
+        "data": "data",
+        "dinheiro": ["valor"]
+    },
+    "compras_cartao": {
+        "campos": ["cartao_id", "data_compra", "descricao", "categoria", "valor", "parcelas", "valor_parcela"],
+        "data": "data_compra",
+        "dinheiro": ["valor", "valor_parcela"]
+    },
+}
+
+# Colunas exportadas por coleção, na ordem do arquivo; "cartao" é o nome do cartão da compra
+COLUNAS_EXPORTACAO = {
+    "transacoes": ["data", "descricao", "categoria_principal", "subcategoria", "valor"],
+    "compras_cartao": ["data_compra", "cartao", "descricao", "categoria", "valor", "parcelas", "valor_parcela"],
+}
+
+
+def _filtro(user_email, campo_data, inicio, fim):
+    """Filtro por usuário e período [inicio, fim); datas ainda em texto são filtradas na leitura"""
+    filtro = {"user_email": user_email}
+    periodo = {}
+    if inicio:
+        periodo["$gte"] = inicio
+    if fim:
+        periodo["$lt"] = fim
+    if periodo:
+        filtro["$or"] = [{campo_data: periodo}, {campo_data: {"$type": "string"}}]
+    return filtro
+
+
+def ler_lotes(db, user_email, colecao, inicio=None, fim=None, tamanho_lote=TAMANHO_LOTE):
+    """Linhas da coleção em blocos de até `tamanho_lote`, lidas do cursor sob demanda (dinheiro em centavos)"""
+    config = COLECOES_EXPORTACAO[colecao]
+    campo_data = config["data"]
+    colunas = COLUNAS_EXPORTACAO[colecao]
+    inicio, fim = para_datetime(inicio), para_datetime(fim)
+
+    cartoes = {}
+    if colecao == "compras_cartao":
+        cartoes = {
+            cartao["_id"]: cartao["nome"]
+            for cartao in db.get_collection("cartoes").find({"user_email": user_email}, {"nome": 1})
+        }
+
+    cursor = (
+        db.get_collection(colecao)
+        .find(_filtro(user_email, campo_data, inicio, fim), {"_id": 0, **{campo: 1 for campo in config["campos"]}})
+        .sort(campo_data, ASCENDING)
+        .batch_size(tamanho_lote)
+    )
+
+    lote = []
+    for documento in cursor:
+        data = para_datetime(documento.get(campo_data))
+        if data is None or (inicio and data < inicio) or (fim and data >= fim):
+            continue
+
+        documento[campo_data] = data
+        for campo in config["dinheiro"]:
+            documento[campo] = centavos(documento.get(campo))
+        if cartoes:
+            documento["cartao"] = cartoes.get(documento.get("cartao_id"), "")
+
+        lote.append([documento.get(coluna) for coluna in colunas])
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+
+    if lote:
+        yield lote
+
+
+def _texto_reais(valor):
+    """Centavos como texto decimal brasileiro (1234,56), sem passar por float"""
+    inteiro, resto = divmod(abs(valor), 100)
+    return f"{'-' if valor < 0 else ''}{inteiro},{resto:02d}"
+
+
+def escrever_csv(lotes, colecao, saida):
+    """Grava os blocos em CSV (separador ';' e vírgula decimal) em um arquivo binário"""
+    config = COLECOES_EXPORTACAO[colecao]
+    colunas = COLUNAS_EXPORTACAO[colecao]
+    posicao_data = colunas.index(config["data"])
+    posicoes_dinheiro = [colunas.index(campo) for campo in config["dinheiro"]]
+
+    # utf-8-sig: o Excel reconhece a codificação e mantém os acentos
+    texto = io.TextIOWrapper(saida, encoding="utf-8-sig", newline="")
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(colunas)
+
+    for lote in lotes:
+        for linha in lote:
+            linha[posicao_data] = formatar_data(linha[posicao_data])
+            for posicao in posicoes_dinheiro:
+                linha[posicao] = _texto_reais(linha[posicao])
+        escritor.writerows(lote)
+
+    texto.flush()
+    # Solta o arquivo sem fechá-lo: quem chamou ainda pode lê-lo (ex.: botão de download)
+    texto.detach()
+
+
+def esquema_parquet(colecao):
+    """Tipos das colunas exportadas em Parquet; dinheiro em reais"""
+    config = COLECOES_EXPORTACAO[colecao]
+    tipos = {
+        config["data"]: pa.timestamp("ms"),
+        "parcelas": pa.int64(),
+        **{campo: pa.float64() for campo in config["dinheiro"]}
+    }
+    return pa.schema([(coluna, tipos.get(coluna, pa.string())) for coluna in COLUNAS_EXPORTACAO[colecao]])
+
+
+def escrever_parquet(lotes, colecao, saida):
+    """Grava cada bloco como um row group de um arquivo Parquet"""
+    if pq is None:
+        raise RuntimeError("pyarrow não está instalado: exporte em CSV")
+
+    esquema = esquema_parquet(colecao)
+    dinheiro = set(COLECOES_EXPORTACAO[colecao]["dinheiro"])
+
+    with pq.ParquetWriter(saida, esquema, compression="zstd") as escritor:
+        for lote in lotes:
+            arrays = []
+            for campo, valores in zip(esquema, zip(*lote)):
+                if campo.name in dinheiro:
+                    arrays.append(pc.divide(pa.array(valores, pa.int64()).cast(pa.float64()), 100.0))
+                else:
+                    arrays.append(pa.array(valores, campo.type))
+            escritor.write_batch(pa.record_batch(arrays, schema=esquema))
+
+
+def exportar(db, user_email, colecao, formato, saida, inicio=None, fim=None, tamanho_lote=TAMANHO_LOTE):
+    """Exporta as linhas do usuário no período [inicio, fim) para um arquivo binário; retorna o número de linhas"""
+    if colecao not in COLUNAS_EXPORTACAO:
+        raise ValueError(f"Coleção sem exportação: {colecao}")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+
+    total = 0
+
+    def contar(lotes):
+        nonlocal total
+        for lote in lotes:
+            total += len(lote)
+            yield lote
+
+    lotes = contar(ler_lotes(db, user_email, colecao, inicio, fim, tamanho_lote))
+    if formato == "csv":
+        escrever_csv(lotes, colecao, saida)
+    else:
+        escrever_parquet(lotes, colecao, saida)
+    return total
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    parser = argparse.ArgumentParser(description="Exporta transações ou compras de cartão para CSV ou Parquet")
+    parser.add_argument("saida", help="arquivo de destino (.csv ou .parquet)")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--colecao", choices=list(COLUNAS_EXPORTACAO), default="transacoes")
+    parser.add_argument("--formato", choices=FORMATOS, help="padrão: pela extensão do arquivo")
+    parser.add_argument("--inicio", help="data inicial (AAAA-MM-DD), inclusiva")
+    parser.add_argument("--fim", help="data final (AAAA-MM-DD), exclusiva")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    formato = args.formato or ("parquet" if os.path.splitext(args.saida)[1].lower() == ".parquet" else "csv")
+    for data in (args.inicio, args.fim):
+        if data and para_datetime(data) is None:
+            parser.error(f"data inválida: {data}")
+
+    db = get_client().get_database(NOME_BANCO)
+    with open(args.saida, "wb") as saida:
+        total = exportar(db, args.email, args.colecao, formato, saida, args.inicio, args.fim, args.lote)
+
+    print(f"{total} linhas exportadas para {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import pandas as pd
+import numpy as np
+
+# Troca os separadores do formato americano (1,381.86) pelos brasileiros (1.381,86) de uma vez
+_SEPARADORES_BR = str.maketrans(",.", ".,")
+
+
+def format_brl(valor):
+    """Formata número para padrão brasileiro: R$ 1.381,86"""
+    try:
+        return f"R$ {valor:,.2f}".translate(_SEPARADORES_BR)
+    except Exception:
+        return "R$ 0,00"
+
+
+def formatar_coluna_brl(centavos, sinais=None):
+    """Formata uma coluna de centavos inteiros como R$ 1.381,86 em operações sobre o array inteiro"""
+    valores = np.asarray(centavos, dtype=np.int64)
+    if valores.size == 0:
+        texto = valores.astype(str)
+    else:
+        inteiros, resto = np.divmod(np.abs(valores), 100)
+
+        # Quantidade de dígitos da parte inteira de cada valor
+        digitos = np.ones(valores.size, dtype=np.int64)
+        limite = 10
+        while limite <= inteiros.max():
+            digitos += inteiros >= limite
+            limite *= 10
+
+        # Uma coluna de bytes ASCII por caractere, alinhada à direita; posições vazias ficam em branco
+        colunas = []
+        for posicao in range(int(digitos.max()) - 1, -1, -1):
+            usada = posicao < digitos
+            colunas.append(np.where(usada, ord("0") + (inteiros // 10 ** posicao) % 10, ord(" ")))
+            if posicao % 3 == 0 and posicao > 0:
+                colunas.append(np.where(usada, ord("."), ord(" ")))
+        colunas += [np.full(valores.size, ord(",")), ord("0") + resto // 10, ord("0") + resto % 10]
+
+        matriz = np.stack(colunas, axis=1).astype(np.uint8)
+        texto = np.strings.lstrip(matriz.view(f"S{matriz.shape[1]}").ravel().astype(str))
+
+        if sinais is None:
+            sinais = np.where(valores < 0, "-", "")
+        texto = np.strings.add(np.strings.add(sinais, "R$ "), texto)
+
+    if isinstance(centavos, pd.Series):
+        return pd.Series(texto, index=centavos.index, dtype=object)
+    return texto
+
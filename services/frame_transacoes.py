@@ -0,0 +1,88 @@
+from services.get_transacao import get_transacao
+from services.cache import em_cache
+from services.criar_grafic import impressao_digital
+from functools import cached_property
+import pandas as pd
+import threading
+
+# Acima deste número de pontos por série, a série temporal passa de diária para semanal ou mensal
+MAX_PONTOS_SERIE = 400
+# Períodos de agrupamento: frequência do pandas, dias aproximados por ponto e rótulo
+PERIODOS = [("D", 1, "Diária"), ("W", 7, "Semanal"), ("MS", 30, "Mensal")]
+
+
+# O DataFrame e as visões são compartilhados entre sessões e reruns: não devem ser alterados
+class FrameTransacoes:
+    """Transações do usuário com visões derivadas calculadas uma única vez"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._lock = threading.Lock()
+        self._memo = {}
+
+    def _memorizar(self, chave, calcular):
+        """Memoriza visões que dependem de um parâmetro (ex.: número de dias)"""
+        with self._lock:
+            if chave not in self._memo:
+                self._memo[chave] = calcular()
+            return self._memo[chave]
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def __len__(self):
+        return len(self.df)
+
+    @cached_property
+    def impressao_digital(self):
+        """Hash do conteúdo, usado como chave do cache de figuras"""
+        return impressao_digital(self.df)
+
+    @cached_property
+    def _com_data(self):
+        """Linhas com data válida: datas ilegíveis viram NaT e quebram o agrupamento por período"""
+        return self.df.dropna(subset=["Data"]) if not self.df.empty else self.df
+
+    def _por_periodo(self, frequencia):
+        return (
+            self._com_data.groupby([pd.Grouper(key="Data", freq=frequencia), "Categoria Principal"], observed=True)["Centavos"]
+            .sum()
+            .reset_index()
+        )
+
+    @cached_property
+    def por_dia(self):
+        """Centavos por dia e categoria principal"""
+        return self._por_periodo("D")
+
+    @cached_property
+    def por_semana(self):
+        """Centavos por semana e categoria principal"""
+        return self._por_periodo("W")
+
+    @cached_property
+    def por_mes(self):
+        """Centavos por mês (primeiro dia) e categoria principal"""
+        return self._por_periodo("MS")
+
+    def serie_temporal(self, max_pontos=MAX_PONTOS_SERIE):
+        """Série por categoria no menor período (dia, semana ou mês) que cabe em max_pontos, com o rótulo"""
+        datas = self._com_data["Data"]
+        dias = (datas.max() - datas.min()).days + 1 if not datas.empty else 0
+        frequencia, _, rotulo = next(
+            (periodo for periodo in PERIODOS if dias / periodo[1] <= max_pontos), PERIODOS[-1]
+        )
+        visao = {"D": "por_dia", "W": "por_semana", "MS": "por_mes"}[frequencia]
+
+        def calcular():
+            serie = getattr(self, visao)
+            return serie.assign(**{"Valor R$": serie["Centavos"] / 100}), rotulo
+
+        return self._memorizar(("serie_temporal", max_pontos), calcular)
+
+
+@em_cache("transacoes", copiar=False)
+def get_frame_transacoes(user_email, inicio=None, fim=None):
+    """Frame de análise das transações (opcionalmente do período [inicio, fim)), criado uma vez por versão dos dados"""
+    return FrameTransacoes(get_transacao(user_email, inicio, fim))
@@ -1,31 +1,135 @@
 from config.db_config import connect_db
+from services.datas import para_datetime
+from services.dinheiro import centavos
+from services.cache import em_cache, sem_cache
+from services.snapshot_local import carregar_ou_sincronizar, COLECOES_SNAPSHOT
 import streamlit as st
 import pandas as pd
 
-@st.cache_data(ttl=300)
-def get_transacao():
+# Apenas os campos usados pelas páginas
+PROJECAO_TRANSACOES = {"_id": 0, **{campo: 1 for campo in COLECOES_SNAPSHOT["transacoes"]["campos"]}}
 
+COLUNAS_EXIBICAO = {
+    'data': 'Data',
+    'descricao': 'Descrição',
+    'categoria_principal': 'Categoria Principal',
+    'subcategoria': 'Subcategoria',
+    'valor': 'Centavos'
+}
+
+# Esquema do DataFrame de transações: só as colunas usadas, textos repetidos como categorias
+# e valores em centavos inteiros, somados sem erro de arredondamento
+ESQUEMA_TRANSACOES = {
+    'Data': 'datetime64[ns]',
+    'Descrição': 'category',
+    'Categoria Principal': pd.CategoricalDtype(['Receita', 'Despesa']),
+    'Subcategoria': 'category',
+    'Centavos': 'int64'
+}
+
+
+def compactar_transacoes(df):
+    """Aplica o esquema compacto ao DataFrame de transações"""
+    df = df.rename(columns=COLUNAS_EXIBICAO).reindex(columns=list(ESQUEMA_TRANSACOES))
+    return df.astype(ESQUEMA_TRANSACOES)
+
+
+TAMANHOS_PAGINA = [25, 50, 100, 200]
+
+
+@em_cache("transacoes", copiar=False)
+def get_pagina_transacoes(user_email, tamanho=50, depois_de=None, antes_de=None):
+    """Página de transações e cursor da próxima (None na última), paginadas por (data, _id)"""
+    # depois_de: (data, _id) da última transação da página anterior
+    # antes_de: começa a lista nessa data (ex.: primeiro dia do mês seguinte ao escolhido)
     try:
         db = connect_db()
         colecao = db.get_collection("transacoes")
-        transacoes = list(colecao.find())
-        
+
+        # Datas ainda em texto ficam de fora até a migração (não têm posição na ordem por data)
+        filtro = {"user_email": user_email, "data": {"$type": "date"}}
+        if antes_de:
+            filtro["data"]["$lt"] = para_datetime(antes_de)
+        if depois_de:
+            data, _id = depois_de
+            filtro["$or"] = [{"data": {"$lt": data}}, {"data": data, "_id": {"$lt": _id}}]
+
+        # Um documento a mais indica se existe próxima página
+        transacoes = list(
+            colecao.find(filtro, {**PROJECAO_TRANSACOES, "_id": 1})
+            .sort([("data", -1), ("_id", -1)])
+            .limit(tamanho + 1)
+        )
+
+        proximo = None
+        if len(transacoes) > tamanho:
+            transacoes = transacoes[:tamanho]
+            proximo = (transacoes[-1]["data"], transacoes[-1]["_id"])
+
+        df = pd.DataFrame(
+            [{**t, 'valor': centavos(t.get('valor'))} for t in transacoes],
+            columns=list(COLUNAS_EXIBICAO)
+        )
+        return compactar_transacoes(df), proximo
+
+    except Exception as e:
+        st.error(f"Erro ao carregar transações: {str(e)}")
+        return sem_cache((compactar_transacoes(pd.DataFrame()), None))
+
+
+def registrar_memoria(nome, df):
+    """Guarda na sessão quanto um DataFrame ocupa em memória"""
+    st.session_state.setdefault("memoria_frames", {})[nome] = int(df.memory_usage(deep=True).sum())
+
+
+def memoria_sessao():
+    """Total em bytes dos DataFrames registrados nesta sessão"""
+    return sum(st.session_state.get("memoria_frames", {}).values())
+
+
+# O DataFrame é compartilhado entre as sessões: as páginas não devem alterá-lo
+@em_cache("transacoes", copiar=False)
+def get_transacao(user_email, inicio=None, fim=None):
+    """Carrega as transações do usuário, opcionalmente limitadas ao período [inicio, fim)"""
+    try:
+        db = connect_db()
+        colecao = db.get_collection("transacoes")
+
+        if not inicio and not fim:
+            # Histórico completo: snapshot local mais as mudanças desde a última sincronização
+            return compactar_transacoes(carregar_ou_sincronizar(db, user_email, "transacoes"))
+
+        periodo = {}
+        if inicio:
+            periodo["$gte"] = para_datetime(inicio)
+        if fim:
+            periodo["$lt"] = para_datetime(fim)
+        # Datas ainda em texto não entram na faixa do índice e são filtradas abaixo
+        filtro = {"user_email": user_email, "$or": [{"data": periodo}, {"data": {"$type": "string"}}]}
+
+        transacoes = list(colecao.find(filtro, PROJECAO_TRANSACOES).sort("data", -1))
+
         if not transacoes:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(transacoes)
-        df = df.drop(columns=['_id'], errors='ignore')
-        df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y', errors='coerce')
-        df = df.sort_values(by='data', ascending=False).reset_index(drop=True)
-        
-        return df.rename(columns={
-            'data': 'Data',
-            'descricao': 'Descrição', 
-            'categoria_principal': 'Categoria Principal',
-            'subcategoria': 'Subcategoria',
-            'valor': 'Valor R$'
-        })
-        
+            return compactar_transacoes(pd.DataFrame())
+
+        # Centavos convertidos antes do DataFrame: uma coluna com int e float viraria float
+        df = pd.DataFrame([{**t, 'valor': centavos(t.get('valor'))} for t in transacoes])
+        legados = df['data'].map(lambda valor: isinstance(valor, str)).any()
+
+        # Aceita datas BSON e textos legados durante a migração
+        df['data'] = pd.to_datetime(df['data'].map(para_datetime), errors='coerce')
+
+        if legados:
+            if inicio:
+                df = df[df['data'] >= para_datetime(inicio)]
+            if fim:
+                df = df[df['data'] < para_datetime(fim)]
+            df = df.sort_values(by='data', ascending=False)
+
+        df = df.reset_index(drop=True)
+
+        return compactar_transacoes(df)
+
     except Exception as e:
         st.error(f"Erro ao carregar transações: {str(e)}")
-        return pd.DataFrame()
+        return sem_cache(compactar_transacoes(pd.DataFrame()))
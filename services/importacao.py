@@ -0,0 +1,362 @@
+from services.datas import para_datetime, para_data_bson
+from services.dinheiro import para_centavos
+from services.resumo_mensal import registrar_lote_no_resumo
+from services.cartao_service import gerar_parcelas, mes_fatura
+from services.cache import invalidar
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from datetime import datetime
+import unicodedata
+import hashlib
+import argparse
+import csv
+import io
+import re
+
+TAMANHO_LOTE = 1000
+
+# Nomes de coluna aceitos nos CSVs dos bancos (sem acento, em minúsculas)
+COLUNAS_CSV = {
+    "data": ["data", "date", "data lancamento", "data da compra", "data compra", "dt"],
+    "descricao": ["descricao", "historico", "lancamento", "estabelecimento", "title", "description", "memo"],
+    "valor": ["valor", "valor (r$)", "valor r$", "amount", "quantia"],
+}
+
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+# Código de erro do MongoDB para chave duplicada em índice único
+CHAVE_DUPLICADA = 11000
+
+
+def _normalizar(texto):
+    """Minúsculas e sem acentos, para comparar nomes de colunas"""
+    texto = unicodedata.normalize("NFKD", texto.strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def ler_valor(texto):
+    """Converte valores como '-1.234,56', '1,234.56' ou '(12,00)' para centavos"""
+    texto = texto.strip().replace("R$", "").replace(" ", "")
+    negativo = texto.startswith("-") or (texto.startswith("(") and texto.endswith(")"))
+    texto = texto.strip("-+()")
+
+    # O último separador seguido de até dois dígitos é o decimal; os outros agrupam milhares
+    ultimo = max(texto.rfind(","), texto.rfind("."))
+    if ultimo >= 0 and len(texto) - ultimo - 1 <= 2:
+        inteiro, decimal = texto[:ultimo], texto[ultimo + 1:]
+    else:
+        inteiro, decimal = texto, "0"
+    inteiro = inteiro.replace(",", "").replace(".", "") or "0"
+
+    valor = para_centavos(f"{inteiro}.{decimal or '0'}")
+    return -valor if negativo else valor
+
+
+def abrir_texto(arquivo):
+    """Envolve um arquivo binário em leitura de texto, em UTF-8 ou Windows-1252"""
+    inicio = arquivo.read(65536)
+    arquivo.seek(0)
+    try:
+        inicio.decode("utf-8")
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "cp1252"
+    return io.TextIOWrapper(arquivo, encoding=codificacao, errors="replace", newline="")
+
+
+def ler_csv(texto):
+    """Lê um CSV linha a linha, gerando {data, descricao, valor (centavos), conta (None: o CSV não a identifica)}"""
+    # O separador mais frequente no cabeçalho; valores como "1.234,56" confundiriam o csv.Sniffer
+    cabecalho = texto.readline()
+    texto.seek(0)
+    separador = max(";,\t|", key=cabecalho.count)
+
+    leitor = csv.reader(texto, delimiter=separador)
+    cabecalho = [_normalizar(coluna) for coluna in next(leitor, [])]
+
+    indices = {}
+    for campo, nomes in COLUNAS_CSV.items():
+        indice = next((cabecalho.index(nome) for nome in nomes if nome in cabecalho), None)
+        if indice is None:
+            indice = next((i for i, coluna in enumerate(cabecalho) if coluna.startswith(nomes[0])), None)
+        if indice is None:
+            raise ValueError(f"Coluna de {campo} não encontrada no CSV")
+        indices[campo] = indice
+
+    for linha in leitor:
+        if len(linha) <= max(indices.values()):
+            yield None
+            continue
+        try:
+            valor = ler_valor(linha[indices["valor"]])
+        except ArithmeticError:
+            valor = None
+        yield {
+            "data": para_datetime(linha[indices["data"]].strip()),
+            "descricao": linha[indices["descricao"]].strip(),
+            "valor": valor,
+            "conta": None
+        }
+
+
+def ler_ofx(texto):
+    """Lê os lançamentos (STMTTRN) de um OFX linha a linha, gerando {data, descricao, valor, conta}"""
+    lancamento = None
+    conta = {}
+    for linha in texto:
+        for fechamento, tag, conteudo in _TAG_OFX.findall(linha):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if fechamento:
+                    yield _lancamento_ofx(lancamento, conta)
+                    lancamento = None
+                else:
+                    lancamento = {}
+            elif tag in ("BANKACCTFROM", "CCACCTFROM") and not fechamento:
+                # Um arquivo pode trazer extratos de mais de uma conta
+                conta = {}
+            elif lancamento is not None and not fechamento and conteudo.strip():
+                lancamento[tag] = conteudo.strip()
+            elif tag in ("BANKID", "ACCTID") and not fechamento and conteudo.strip():
+                conta[tag] = conteudo.strip()
+
+
+def _lancamento_ofx(campos, conta):
+    """Converte as tags de um STMTTRN no formato comum dos leitores"""
+    if not campos or "DTPOSTED" not in campos or "TRNAMT" not in campos:
+        return None
+    try:
+        data = datetime.strptime(campos["DTPOSTED"][:8], "%Y%m%d")
+        valor = ler_valor(campos["TRNAMT"])
+    except (ValueError, ArithmeticError):
+        return None
+    return {
+        "data": data,
+        "descricao": campos.get("MEMO") or campos.get("NAME", ""),
+        "valor": valor,
+        "conta": "/".join(conta[tag] for tag in ("BANKID", "ACCTID") if tag in conta) or None
+    }
+
+
+def ler_extrato(arquivo, formato="auto", nome=""):
+    """Lançamentos de um arquivo binário OFX ou CSV, lidos sob demanda"""
+    if formato == "auto":
+        formato = "ofx" if nome.lower().endswith((".ofx", ".qfx")) else "csv"
+    texto = abrir_texto(arquivo)
+    return ler_ofx(texto) if formato == "ofx" else ler_csv(texto)
+
+
+def chave_conteudo(conta, lancamento):
+    """Conta ou cartão, data, valor em centavos (com o sinal do arquivo) e descrição normalizada"""
+    return (
+        str(conta),
+        lancamento["data"].strftime("%Y-%m-%d"),
+        lancamento["valor"],
+        " ".join(_normalizar(lancamento["descricao"]).split())
+    )
+
+
+def hash_conteudo(user_email, chave, ocorrencia):
+    """Impressão digital de um lançamento importado; `ocorrencia` separa lançamentos iguais no mesmo dia"""
+    texto = "|".join([user_email, *map(str, chave), str(ocorrencia)])
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def hashes_conhecidos(colecao, user_email):
+    """Impressões digitais já gravadas, lidas apenas do índice único"""
+    return {
+        documento["hash_conteudo"]
+        for documento in colecao.find(
+            {"user_email": user_email, "hash_conteudo": {"$exists": True}},
+            {"_id": 0, "hash_conteudo": 1}
+        )
+    }
+
+
+def _documento_transacao(lancamento, user_email, subcategoria, agora):
+    return {
+        "user_email": user_email,
+        "data": para_data_bson(lancamento["data"]),
+        "valor": abs(lancamento["valor"]),
+        "descricao": lancamento["descricao"],
+        "categoria_principal": "Receita" if lancamento["valor"] > 0 else "Despesa",
+        "subcategoria": subcategoria,
+        "criado_em": agora
+    }
+
+
+def _documento_compra(lancamento, user_email, cartao, categoria, agora):
+    return {
+        # _id gerado aqui para as parcelas poderem referenciar a compra antes da gravação
+        "_id": ObjectId(),
+        "user_email": user_email,
+        "cartao_id": cartao["_id"],
+        "descricao": lancamento["descricao"],
+        "valor": abs(lancamento["valor"]),
+        "categoria": categoria,
+        "data_compra": para_data_bson(lancamento["data"]),
+        "parcelas": 1,
+        "valor_parcela": abs(lancamento["valor"]),
+        "data_criacao": agora
+    }
+
+
+def _gravar_sem_duplicar(colecao, lote):
+    """Grava o lote com upsert pela impressão digital e retorna apenas os documentos inseridos"""
+    operacoes = [
+        UpdateOne(
+            {"user_email": documento["user_email"], "hash_conteudo": documento["hash_conteudo"]},
+            {"$setOnInsert": documento},
+            upsert=True
+        )
+        for documento in lote
+    ]
+    try:
+        inseridos = colecao.bulk_write(operacoes, ordered=False).upserted_ids
+    except BulkWriteError as e:
+        # Outra importação simultânea pode ter gravado o mesmo lançamento; só isso é tolerado
+        if any(erro["code"] != CHAVE_DUPLICADA for erro in e.details.get("writeErrors", [])):
+            raise
+        inseridos = {upsert["index"]: upsert["_id"] for upsert in e.details.get("upserted", [])}
+    return [lote[indice] for indice in sorted(inseridos)]
+
+
+def _gravar_transacoes(db, lote):
+    inseridos = _gravar_sem_duplicar(db.get_collection("transacoes"), lote)
+    registrar_lote_no_resumo(db, inseridos)
+    return len(inseridos)
+
+
+def _gravar_compras(db, lote, cartao, meses_alterados):
+    inseridos = _gravar_sem_duplicar(db.get_collection("compras_cartao"), lote)
+    parcelas = [parcela for compra in inseridos for parcela in gerar_parcelas(compra, cartao["dia_fechamento"])]
+    if parcelas:
+        db.get_collection("parcelas_cartao").insert_many(parcelas, ordered=True)
+    meses_alterados.update(parcela["mes_fatura"] for parcela in parcelas)
+    return len(inseridos)
+
+
+def importar_extrato(db, user_email, lancamentos, destino="transacoes", cartao=None, conta=None,
+                     categoria="Outros", sinal_invertido=False, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Grava os lançamentos em lotes em `transacoes` ou nas compras de um cartão, sem repetir os já importados"""
+    # conta: nome da conta bancária, usado quando o arquivo não a identifica (CSV)
+    if destino == "compras_cartao" and cartao is None:
+        raise ValueError("Informe o cartão para importar compras")
+    conhecidos = hashes_conhecidos(db.get_collection(destino), user_email)
+    ocorrencias = {}
+
+    agora = datetime.now().isoformat()
+    importados = duplicados = ignorados = 0
+    meses_alterados = set()
+    lote = []
+
+    def gravar():
+        nonlocal importados, duplicados
+        if destino == "transacoes":
+            gravados = _gravar_transacoes(db, lote)
+        else:
+            gravados = _gravar_compras(db, lote, cartao, meses_alterados)
+        importados += gravados
+        duplicados += len(lote) - gravados
+        lote.clear()
+        if progresso:
+            progresso(importados, ignorados)
+
+    for lancamento in lancamentos:
+        if not lancamento or lancamento["data"] is None or not lancamento["valor"]:
+            ignorados += 1
+            continue
+        # A impressão digital usa o lançamento como está no arquivo, antes de inverter o sinal:
+        # reimportar com a opção marcada de outro jeito continua reconhecendo os lançamentos
+        if destino == "compras_cartao":
+            chave = chave_conteudo(cartao["_id"], lancamento)
+        else:
+            # Conta do próprio arquivo (OFX); senão a informada na importação
+            conta_lancamento = lancamento.get("conta") or conta
+            if not conta_lancamento:
+                raise ValueError("O arquivo não identifica a conta: informe o nome da conta")
+            chave = chave_conteudo(f"conta:{conta_lancamento}", lancamento)
+
+        if sinal_invertido:
+            lancamento = {**lancamento, "valor": -lancamento["valor"]}
+
+        if destino == "transacoes":
+            documento = _documento_transacao(lancamento, user_email, categoria, agora)
+        elif lancamento["valor"] < 0:
+            # Na fatura, compras são débitos; pagamentos e estornos (créditos) ficam de fora
+            documento = _documento_compra(lancamento, user_email, cartao, categoria, agora)
+        else:
+            ignorados += 1
+            continue
+
+        # A ordem de um lançamento entre os iguais do arquivo se repete ao reimportar o mesmo período
+        ocorrencias[chave] = ocorrencias.get(chave, 0) + 1
+        documento["hash_conteudo"] = hash_conteudo(user_email, chave, ocorrencias[chave])
+
+        if documento["hash_conteudo"] in conhecidos:
+            duplicados += 1
+            continue
+
+        lote.append(documento)
+        if len(lote) >= tamanho_lote:
+            gravar()
+
+    if lote:
+        gravar()
+
+    if destino == "compras_cartao" and meses_alterados:
+        # Compras em ciclos já fechados invalidam as faturas congeladas desses meses
+        mes_aberto = mes_fatura(datetime.now(), cartao["dia_fechamento"])
+        fechados = [mes for mes in meses_alterados if mes < mes_aberto]
+        if fechados:
+            db.get_collection("faturas_cartao").delete_many({"cartao_id": cartao["_id"], "mes_ano": {"$in": fechados}})
+
+    if importados:
+        invalidar(user_email, destino)
+    return {"importados": importados, "duplicados": duplicados, "ignorados": ignorados}
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    parser = argparse.ArgumentParser(description="Importa um extrato OFX ou CSV")
+    parser.add_argument("arquivo")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--formato", choices=["auto", "ofx", "csv"], default="auto")
+    parser.add_argument("--cartao", help="nome do cartão: importa como compras desse cartão")
+    parser.add_argument("--conta", help="nome da conta bancária, obrigatório quando o arquivo não a identifica (CSV)")
+    parser.add_argument("--categoria", default="Outros", help="subcategoria (ou categoria da compra) atribuída")
+    parser.add_argument("--sinal-invertido", action="store_true", help="o arquivo lista débitos como valores positivos")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    db = get_client().get_database(NOME_BANCO)
+
+    cartao = None
+    if args.cartao:
+        cartao = db.get_collection("cartoes").find_one({"user_email": args.email, "nome": args.cartao})
+        if not cartao:
+            parser.error(f"cartão '{args.cartao}' não encontrado")
+
+    with open(args.arquivo, "rb") as arquivo:
+        resultado = importar_extrato(
+            db, args.email,
+            ler_extrato(arquivo, args.formato, args.arquivo),
+            destino="compras_cartao" if cartao else "transacoes",
+            cartao=cartao,
+            conta=args.conta,
+            categoria=args.categoria,
+            sinal_invertido=args.sinal_invertido,
+            tamanho_lote=args.lote,
+            progresso=lambda importados, ignorados: print(f"{importados} importados, {ignorados} ignorados")
+        )
+
+    print(
+        f"{resultado['importados']} lançamentos importados, "
+        f"{resultado['duplicados']} já existentes, {resultado['ignorados']} ignorados"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from config.db_config import connect_db
+from services.datas import expressao_data_normalizada
+from services.resumo_mensal import COLECAO_RESUMO
+from services.dinheiro import reais, expressao_centavos
+from services.cache import em_cache, sem_cache
+from datetime import datetime, timedelta
+import streamlit as st
+
+METRICAS_VAZIAS = {
+    "receitas_total": 0.0,
+    "despesas_total": 0.0,
+    "receitas_mes": 0.0,
+    "despesas_mes": 0.0,
+    "maior_subcategoria": None,
+    "despesas_7_dias": None
+}
+
+
+def _totais_por_categoria(grupos):
+    """Converte a saída de um $group por categoria_principal em receitas/despesas (em reais)"""
+    totais = {grupo["_id"]: grupo["total"] for grupo in grupos}
+    return reais(totais.get("Receita", 0)), reais(totais.get("Despesa", 0))
+
+
+def _despesas_ultimos_dias(db, user_email, inicio):
+    """Soma as despesas a partir de `inicio` (None se não houver transações no período)"""
+    pipeline = [
+        # Datas ainda em texto não entram na faixa do índice e são convertidas abaixo
+        {"$match": {
+            "user_email": user_email,
+            "$or": [{"data": {"$gte": inicio}}, {"data": {"$type": "string"}}]
+        }},
+        {"$project": {
+            "categoria_principal": 1,
+            "valor": expressao_centavos("valor"),
+            "data": expressao_data_normalizada("data")
+        }},
+        {"$match": {"data": {"$gte": inicio}}},
+        {"$group": {
+            "_id": None,
+            "despesas": {"$sum": {
+                "$cond": [{"$eq": ["$categoria_principal", "Despesa"]}, "$valor", 0]
+            }}
+        }}
+    ]
+    resultado = next(db.get_collection("transacoes").aggregate(pipeline), None)
+    return reais(resultado["despesas"]) if resultado else None
+
+
+@em_cache("transacoes")
+def get_metricas_dashboard(user_email, hoje):
+    """Calcula as métricas do dashboard a partir do resumo mensal"""
+    try:
+        db = connect_db()
+        colecao = db.get_collection(COLECAO_RESUMO)
+
+        # Totais em centavos; resumos anteriores à migração ainda podem estar em reais
+        soma_por_categoria = {"$group": {"_id": "$categoria_principal", "total": {"$sum": expressao_centavos("total")}}}
+
+        pipeline = [
+            {"$match": {"user_email": user_email}},
+            {"$facet": {
+                "totais": [soma_por_categoria],
+                "mes": [
+                    {"$match": {"ano_mes": hoje.strftime("%Y-%m")}},
+                    soma_por_categoria
+                ],
+                "maior_subcategoria": [
+                    {"$match": {"categoria_principal": "Despesa"}},
+                    {"$group": {"_id": "$subcategoria", "total": {"$sum": expressao_centavos("total")}}},
+                    {"$sort": {"total": -1}},
+                    {"$limit": 1}
+                ]
+            }}
+        ]
+
+        resultado = next(colecao.aggregate(pipeline), None)
+        if not resultado:
+            return dict(METRICAS_VAZIAS)
+
+        receitas_total, despesas_total = _totais_por_categoria(resultado["totais"])
+        receitas_mes, despesas_mes = _totais_por_categoria(resultado["mes"])
+        maior = resultado["maior_subcategoria"]
+
+        # Datas são gravadas à meia-noite: a janela de 7 dias começa 6 dias atrás
+        inicio_semana = datetime.combine(hoje - timedelta(days=6), datetime.min.time())
+
+        return {
+            "receitas_total": receitas_total,
+            "despesas_total": despesas_total,
+            "receitas_mes": receitas_mes,
+            "despesas_mes": despesas_mes,
+            "maior_subcategoria": (maior[0]["_id"], reais(maior[0]["total"])) if maior else None,
+            "despesas_7_dias": _despesas_ultimos_dias(db, user_email, inicio_semana)
+        }
+
+    except Exception as e:
+        st.error(f"Erro ao calcular métricas: {str(e)}")
+        return sem_cache(dict(METRICAS_VAZIAS))
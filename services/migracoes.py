@@ -0,0 +1,244 @@
+from pymongo import UpdateOne
+from services.dinheiro import centavos
+from datetime import datetime
+import argparse
+
+# Campos de data gravados como texto: (coleção, campo, formato legado)
+CAMPOS_DATA = [
+    ("transacoes", "data", "%d/%m/%Y"),
+    ("compras_cartao", "data_compra", "%Y-%m-%d"),
+    ("objetivos", "prazo", "%Y-%m-%d"),
+]
+
+# Campos de dinheiro gravados em reais (float) que passam a centavos inteiros
+CAMPOS_DINHEIRO = [
+    ("transacoes", ["valor"]),
+    ("compras_cartao", ["valor", "valor_parcela"]),
+    ("cartoes", ["limite"]),
+    ("objetivos", ["valor_meta", "valor_atual"]),
+]
+
+# Coleções cujos documentos pertencem a um usuário
+COLECOES_DO_USUARIO = ["transacoes", "cartoes", "compras_cartao", "objetivos"]
+
+
+def _salvar_progresso(db, chave, dados, incrementos=None):
+    """Registra o progresso de uma migração para permitir retomada"""
+    atualizacao = {"$set": {**dados, "atualizado_em": datetime.now()}}
+    if incrementos:
+        atualizacao["$inc"] = incrementos
+    db.get_collection("migracoes").update_one({"_id": chave}, atualizacao, upsert=True)
+
+
+def migrar_campo_data(db, nome_colecao, campo, formato, tamanho_lote=500, progresso=None):
+    """Converte um campo de data em texto para data BSON, em lotes retomáveis"""
+    colecao = db.get_collection(nome_colecao)
+    chave = f"datas:{nome_colecao}.{campo}"
+
+    estado = db.get_collection("migracoes").find_one({"_id": chave}) or {}
+    filtro = {campo: {"$type": "string"}}
+    if estado.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": estado["ultimo_id"]}
+
+    convertidos = 0
+    while True:
+        lote = list(colecao.find(filtro, {campo: 1}).sort("_id", 1).limit(tamanho_lote))
+        if not lote:
+            break
+
+        operacoes = []
+        invalidos = 0
+        for documento in lote:
+            try:
+                nova_data = datetime.strptime(documento[campo], formato)
+            except ValueError:
+                invalidos += 1
+                continue
+            # O filtro pelo valor antigo evita sobrescrever uma edição concorrente
+            operacoes.append(UpdateOne(
+                {"_id": documento["_id"], campo: documento[campo]},
+                {"$set": {campo: nova_data}}
+            ))
+
+        if operacoes:
+            colecao.bulk_write(operacoes, ordered=False)
+
+        convertidos += len(operacoes)
+        filtro["_id"] = {"$gt": lote[-1]["_id"]}
+        _salvar_progresso(
+            db, chave,
+            {"ultimo_id": lote[-1]["_id"], "concluida": False},
+            {"convertidos": len(operacoes), "invalidos": invalidos}
+        )
+
+        if progresso:
+            progresso(nome_colecao, convertidos)
+
+    _salvar_progresso(db, chave, {"concluida": True})
+    return convertidos
+
+
+def migrar_datas(db, tamanho_lote=500, progresso=None):
+    """Migra todos os campos de data em texto para datas BSON"""
+    return {
+        f"{colecao}.{campo}": migrar_campo_data(db, colecao, campo, formato, tamanho_lote, progresso)
+        for colecao, campo, formato in CAMPOS_DATA
+    }
+
+
+def migrar_campos_dinheiro(db, nome_colecao, campos, tamanho_lote=500, progresso=None):
+    """Converte campos em reais (float) para centavos inteiros, em lotes retomáveis"""
+    colecao = db.get_collection(nome_colecao)
+    chave = f"dinheiro:{nome_colecao}"
+
+    estado = db.get_collection("migracoes").find_one({"_id": chave}) or {}
+    filtro = {"$or": [{campo: {"$type": "double"}} for campo in campos]}
+    if estado.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": estado["ultimo_id"]}
+
+    convertidos = 0
+    while True:
+        lote = list(colecao.find(filtro, {**{campo: 1 for campo in campos}, "parcelas": 1}).sort("_id", 1).limit(tamanho_lote))
+        if not lote:
+            break
+
+        operacoes = []
+        for documento in lote:
+            antigos = {campo: documento[campo] for campo in campos if isinstance(documento.get(campo), float)}
+            novos = {campo: centavos(valor) for campo, valor in antigos.items()}
+
+            # A parcela regular é recalculada do total, sem o arredondamento da divisão em float
+            if nome_colecao == "compras_cartao" and "valor" in novos:
+                novos["valor_parcela"] = novos["valor"] // int(documento.get("parcelas", 1))
+
+            # A marca de atualização faz os snapshots locais buscarem o documento de novo
+            if nome_colecao == "transacoes":
+                novos["atualizado_em"] = datetime.now().isoformat()
+
+            # O filtro pelos valores antigos evita sobrescrever uma edição concorrente
+            operacoes.append(UpdateOne({"_id": documento["_id"], **antigos}, {"$set": novos}))
+
+        colecao.bulk_write(operacoes, ordered=False)
+
+        convertidos += len(operacoes)
+        filtro["_id"] = {"$gt": lote[-1]["_id"]}
+        _salvar_progresso(
+            db, chave,
+            {"ultimo_id": lote[-1]["_id"], "concluida": False},
+            {"convertidos": len(operacoes)}
+        )
+
+        if progresso:
+            progresso(nome_colecao, convertidos)
+
+    _salvar_progresso(db, chave, {"concluida": True})
+    return convertidos
+
+
+def migrar_dinheiro(db, tamanho_lote=500, progresso=None):
+    """Migra os valores para centavos e recalcula parcelas e resumo mensal a partir deles"""
+    from services.cartao_service import reconstruir_parcelas
+    from services.resumo_mensal import reconstruir_resumo
+
+    resultado = {
+        colecao: migrar_campos_dinheiro(db, colecao, campos, tamanho_lote, progresso)
+        for colecao, campos in CAMPOS_DINHEIRO
+    }
+
+    # Parcelas e resumo são derivados: recriá-los aplica a divisão exata das parcelas
+    resultado["parcelas_cartao"] = sum(
+        reconstruir_parcelas(db, cartao, tamanho_lote) for cartao in db.get_collection("cartoes").find()
+    )
+    resultado["transacoes_mensal"] = reconstruir_resumo(db)
+    return resultado
+
+
+def atribuir_usuario(db, user_email, colecoes=None):
+    """Atribui ao usuário os documentos gravados sem dono (campo ausente ou vazio)"""
+    sem_dono = {"$or": [{"user_email": {"$exists": False}}, {"user_email": ""}]}
+    resultado = {}
+
+    for nome_colecao in colecoes or COLECOES_DO_USUARIO:
+        atualizados = db.get_collection(nome_colecao).update_many(
+            sem_dono, {"$set": {"user_email": user_email}}
+        )
+        resultado[nome_colecao] = atualizados.modified_count
+
+    _salvar_progresso(db, f"usuario:{user_email}", {"concluida": True, "resultado": resultado})
+    return resultado
+
+
+def migrar_parcelas(db, progresso=None):
+    """Gera o registro de parcelas das compras existentes, cartão a cartão"""
+    from services.cartao_service import reconstruir_parcelas
+
+    chave = "parcelas:compras_cartao"
+    estado = db.get_collection("migracoes").find_one({"_id": chave}) or {}
+    filtro = {}
+    if estado.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": estado["ultimo_id"]}
+
+    total = 0
+    for cartao in db.get_collection("cartoes").find(filtro).sort("_id", 1):
+        geradas = reconstruir_parcelas(db, cartao)
+        total += geradas
+        _salvar_progresso(db, chave, {"ultimo_id": cartao["_id"], "concluida": False}, {"parcelas": geradas})
+
+        if progresso:
+            progresso(cartao.get("nome", cartao["_id"]), geradas)
+
+    _salvar_progresso(db, chave, {"concluida": True})
+    return total
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    parser = argparse.ArgumentParser(description="Migrações de dados do MongoDB")
+    subparsers = parser.add_subparsers(dest="migracao", required=True)
+
+    parser_datas = subparsers.add_parser("datas", help="converte datas em texto para datas BSON")
+    parser_datas.add_argument("--lote", type=int, default=500)
+
+    parser_usuario = subparsers.add_parser("usuario", help="atribui documentos sem dono a um usuário")
+    parser_usuario.add_argument("--email", required=True)
+    parser_usuario.add_argument("--colecoes", nargs="+", choices=COLECOES_DO_USUARIO)
+
+    subparsers.add_parser("parcelas", help="gera as parcelas das compras de cartão existentes")
+
+    parser_dinheiro = subparsers.add_parser("dinheiro", help="converte valores em reais (float) para centavos inteiros")
+    parser_dinheiro.add_argument("--lote", type=int, default=500)
+
+    args = parser.parse_args()
+    db = get_client().get_database(NOME_BANCO)
+
+    if args.migracao == "datas":
+        resultado = migrar_datas(
+            db, args.lote,
+            progresso=lambda colecao, total: print(f"{colecao}: {total} documentos convertidos")
+        )
+        for campo, total in resultado.items():
+            print(f"{campo}: {total} convertidos")
+
+    elif args.migracao == "usuario":
+        resultado = atribuir_usuario(db, args.email, args.colecoes)
+        for colecao, total in resultado.items():
+            print(f"{colecao}: {total} documentos atribuídos a {args.email}")
+
+    elif args.migracao == "parcelas":
+        total = migrar_parcelas(
+            db, progresso=lambda cartao, geradas: print(f"{cartao}: {geradas} parcelas")
+        )
+        print(f"parcelas_cartao: {total} parcelas geradas")
+
+    elif args.migracao == "dinheiro":
+        resultado = migrar_dinheiro(
+            db, args.lote,
+            progresso=lambda colecao, total: print(f"{colecao}: {total} documentos convertidos")
+        )
+        for colecao, total in resultado.items():
+            print(f"{colecao}: {total}")
+
+
+if __name__ == "__main__":
+    main()
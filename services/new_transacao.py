@@ -1,8 +1,16 @@
 from config.db_config import connect_db
 from services.get_transacao import get_transacao
+from services.datas import para_data_bson
+from services.dinheiro import para_centavos
+from services.resumo_mensal import registrar_no_resumo
+from services.cache import invalidar
+from services.importacao import ler_extrato, importar_extrato
+from services.exportacao import exportar, LIMITE_DOWNLOAD
+from services.cartao_service import CartaoService
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+import tempfile
 import time
 
 
@@ -40,16 +48,20 @@ def new_receita():
                 db = connect_db()
                 colecao = db.get_collection("transacoes")
                 
-                result = colecao.insert_one({
-                    "data": data.strftime("%d/%m/%Y"),
-                    "valor": valor,
+                transacao = {
+                    "user_email": st.session_state.get("user_email", ""),
+                    "data": para_data_bson(data),
+                    "valor": para_centavos(valor),
                     "descricao": descricao.strip(),
                     "categoria_principal": "Receita",
                     "subcategoria": subcategoria,
                     "criado_em": datetime.now().isoformat()
-                })
+                }
+                result = colecao.insert_one(transacao)
                 
                 if result.inserted_id:
+                    registrar_no_resumo(db, transacao)
+                    invalidar(transacao["user_email"], "transacoes")
                     st.success("\u2705 Receita adicionada com sucesso!")
                 else:
                     st.error("\u274C Erro ao salvar. Tente novamente.")
@@ -94,16 +106,20 @@ def new_despesa():
                 db = connect_db()
                 colecao = db.get_collection("transacoes")
                 
-                result = colecao.insert_one({
-                    "data": data.strftime("%d/%m/%Y"),
-                    "valor": valor,
+                transacao = {
+                    "user_email": st.session_state.get("user_email", ""),
+                    "data": para_data_bson(data),
+                    "valor": para_centavos(valor),
                     "descricao": descricao.strip(),
                     "categoria_principal": "Despesa",
                     "subcategoria": subcategoria,
                     "criado_em": datetime.now().isoformat()
-                })
+                }
+                result = colecao.insert_one(transacao)
                 
                 if result.inserted_id:
+                    registrar_no_resumo(db, transacao)
+                    invalidar(transacao["user_email"], "transacoes")
                     st.success("\u2705 Despesa registrada com sucesso!")
                     
                     # Sugestões pós-despesa
@@ -125,23 +141,133 @@ def new_despesa():
             st.rerun()
             
 
+# ---------------- IMPORTAR EXTRATO ----------------
+@st.dialog("\U0001F4E5 Importar Extrato")
+def importar_extrato_dialog():
+
+    arquivo = st.file_uploader("\U0001F4C4 Arquivo do banco (OFX ou CSV)", type=["ofx", "qfx", "csv"])
+
+    cartoes = CartaoService().listar_cartoes()
+    destino = st.selectbox(
+        "\U0001F4C2 Importar para",
+        ["Transações"] + [f"Cartão: {cartao['nome']}" for cartao in cartoes]
+    )
+    cartao = next((c for c in cartoes if destino == f"Cartão: {c['nome']}"), None)
+
+    conta = ""
+    if cartao is None:
+        conta = st.text_input(
+            "\U0001F3E6 Conta bancária",
+            help="Obrigatória para CSV; arquivos OFX já identificam a conta. Lançamentos iguais em contas diferentes não são tratados como repetidos"
+        )
+
+    categoria = st.text_input("\U0001F3F7 Subcategoria dos lançamentos", value="Outros")
+    sinal_invertido = st.checkbox(
+        "O arquivo lista gastos como valores positivos",
+        help="Marque se as despesas (ou compras do cartão) aparecem sem o sinal de menos"
+    )
+
+    if st.button("\U0001F4E5 Importar", type="primary", disabled=arquivo is None):
+        try:
+            barra = st.progress(0.0, text="Lendo arquivo...")
+
+            def progresso(importados, ignorados):
+                # Posição no arquivo como fração do tamanho: o número de linhas não é conhecido antes
+                barra.progress(min(arquivo.tell() / max(arquivo.size, 1), 1.0), text=f"{importados} lançamentos importados")
+
+            resultado = importar_extrato(
+                connect_db(),
+                st.session_state.get("user_email", ""),
+                ler_extrato(arquivo, nome=arquivo.name),
+                destino="compras_cartao" if cartao else "transacoes",
+                cartao=cartao,
+                conta=conta.strip() or None,
+                categoria=categoria.strip() or "Outros",
+                sinal_invertido=sinal_invertido,
+                progresso=progresso
+            )
+            barra.progress(1.0, text="Importação concluída")
+            st.success(
+                f"\u2705 {resultado['importados']} lançamentos importados, "
+                f"{resultado['duplicados']} já existentes, {resultado['ignorados']} ignorados"
+            )
+
+        except Exception as e:
+            st.error(f"\u274C Erro ao importar: {str(e)}")
+
+
+
+# ---------------- EXPORTAR ----------------
+@st.dialog("\U0001F4E4 Exportar Dados")
+def exportar_dialog():
+
+    origem = st.radio("\U0001F4C2 Dados", ["Transações", "Compras de cartão"], horizontal=True)
+    colecao = "transacoes" if origem == "Transações" else "compras_cartao"
+
+    col1, col2 = st.columns(2)
+    with col1:
+        inicio = st.date_input("\U0001F4C5 De", value=None, format="DD/MM/YYYY")
+    with col2:
+        fim = st.date_input("\U0001F4C5 Até", value=None, format="DD/MM/YYYY")
+
+    formato = st.radio(
+        "\U0001F4C4 Formato", ["csv", "parquet"], horizontal=True,
+        format_func=lambda opcao: {"csv": "CSV (Excel)", "parquet": "Parquet"}[opcao]
+    )
+
+    if st.button("\U0001F4E4 Gerar arquivo", type="primary"):
+        try:
+            # O arquivo é escrito em disco bloco a bloco e fechado ao sair do bloco
+            with tempfile.TemporaryFile() as arquivo:
+                with st.spinner("Exportando..."):
+                    total = exportar(
+                        connect_db(),
+                        st.session_state.get("user_email", ""),
+                        colecao,
+                        formato,
+                        arquivo,
+                        inicio=inicio,
+                        fim=fim + timedelta(days=1) if fim else None
+                    )
+
+                # O botão de download guarda o arquivo inteiro em memória para enviá-lo
+                if arquivo.tell() > LIMITE_DOWNLOAD:
+                    st.warning(
+                        f"\u26A0 {total} linhas: arquivo grande demais para baixar pelo navegador. "
+                        "Escolha um período menor ou use `python -m services.exportacao`."
+                    )
+                    return
+                arquivo.seek(0)
+                dados = arquivo.read()
+
+            st.success(f"\u2705 {total} linhas exportadas")
+            st.download_button(
+                "\u2B07 Baixar arquivo",
+                data=dados,
+                file_name=f"{colecao}_{datetime.now():%Y%m%d}.{formato}",
+                mime="text/csv" if formato == "csv" else "application/octet-stream",
+                on_click="ignore",
+                use_container_width=True
+            )
+
+        except Exception as e:
+            st.error(f"\u274C Erro ao exportar: {str(e)}")
+
 # ---------------- RELATÓRIO RÁPIDO ----------------
 def quick_report():
     """Relatório rápido das transações recentes"""
     try:
-        df = get_transacao()
-        if df.empty:
-            return "Nenhuma transação encontrada"
-        
-        # Últimos 7 dias
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        ultimos_7_dias = df[df['Data'] >= (datetime.now() - timedelta(days=7))]
+        # Só a janela dos últimos 7 dias (contando hoje) é lida do banco
+        hoje = datetime.now().date()
+        ultimos_7_dias = get_transacao(
+            st.session_state.get("user_email", ""), inicio=hoje - timedelta(days=6), fim=hoje + timedelta(days=1)
+        )
         
         if ultimos_7_dias.empty:
             return "Nenhuma transação nos últimos 7 dias"
         
-        receitas_7d = ultimos_7_dias[ultimos_7_dias["Categoria Principal"] == "Receita"]["Valor R$"].sum()
-        despesas_7d = ultimos_7_dias[ultimos_7_dias["Categoria Principal"] == "Despesa"]["Valor R$"].sum()
+        receitas_7d = ultimos_7_dias.loc[ultimos_7_dias["Categoria Principal"] == "Receita", "Centavos"].sum() / 100
+        despesas_7d = ultimos_7_dias.loc[ultimos_7_dias["Categoria Principal"] == "Despesa", "Centavos"].sum() / 100
         
         return f"""
 \U0001F4CA **Últimos 7 dias:**   # 📊
@@ -1,6 +1,9 @@
 import streamlit as st
 from datetime import datetime, timedelta
 from config.db_config import connect_db 
+from services.datas import para_datetime, para_data_bson
+from services.dinheiro import para_centavos, em_reais
+from services.cache import em_cache, invalidar, usuario_atual
 
 class ObjetivosService:
     def __init__(self):
@@ -13,9 +16,9 @@ class ObjetivosService:
             "user_email": st.session_state.get("user_email", ""),
             "titulo": dados_objetivo["titulo"],
             "descricao": dados_objetivo.get("descricao", ""),
-            "valor_meta": float(dados_objetivo["valor_meta"]),
-            "valor_atual": float(dados_objetivo.get("valor_atual", 0)),
-            "prazo": dados_objetivo["prazo"].strftime("%Y-%m-%d"),
+            "valor_meta": para_centavos(dados_objetivo["valor_meta"]),
+            "valor_atual": para_centavos(dados_objetivo.get("valor_atual", 0)),
+            "prazo": para_data_bson(dados_objetivo["prazo"]),
             "categoria": dados_objetivo["categoria"],
             "status": "ativo",
             "data_criacao": datetime.now().strftime("%Y-%m-%d"),
@@ -23,17 +26,19 @@ class ObjetivosService:
         }
         
         result = self.colecao.insert_one(objetivo)
+        invalidar(objetivo["user_email"], "objetivos")
         return result.inserted_id is not None
     
+    @em_cache("objetivos")
     def listar_objetivos(self, status="ativo"):
-        """Lista objetivos do usuário logado"""
+        """Lista objetivos do usuário logado (valores em reais)"""
         user_email = st.session_state.get("user_email", "")
         objetivos = list(self.colecao.find({
             "user_email": user_email,
             "status": status
         }).sort("data_criacao", -1))
         
-        return objetivos
+        return [em_reais(objetivo, "valor_meta", "valor_atual") for objetivo in objetivos]
     
     def atualizar_progresso(self, objetivo_id, novo_valor):
         """Atualiza progresso de um objetivo"""
@@ -41,11 +46,12 @@ class ObjetivosService:
             {"_id": objetivo_id},
             {
                 "$set": {
-                    "valor_atual": float(novo_valor),
+                    "valor_atual": para_centavos(novo_valor),
                     "data_ultima_atualizacao": datetime.now().strftime("%Y-%m-%d")
                 }
             }
         )
+        invalidar(usuario_atual(), "objetivos")
         return result.modified_count > 0
     
     def editar_objetivo(self, objetivo_id, dados_atualizados):
@@ -60,11 +66,11 @@ class ObjetivosService:
         if "descricao" in dados_atualizados:
             update_data["descricao"] = dados_atualizados["descricao"]
         if "valor_meta" in dados_atualizados:
-            update_data["valor_meta"] = float(dados_atualizados["valor_meta"])
+            update_data["valor_meta"] = para_centavos(dados_atualizados["valor_meta"])
         if "valor_atual" in dados_atualizados:
-            update_data["valor_atual"] = float(dados_atualizados["valor_atual"])
+            update_data["valor_atual"] = para_centavos(dados_atualizados["valor_atual"])
         if "prazo" in dados_atualizados:
-            update_data["prazo"] = dados_atualizados["prazo"].strftime("%Y-%m-%d")
+            update_data["prazo"] = para_data_bson(dados_atualizados["prazo"])
         if "categoria" in dados_atualizados:
             update_data["categoria"] = dados_atualizados["categoria"]
             
@@ -72,6 +78,16 @@ class ObjetivosService:
             {"_id": objetivo_id},
             {"$set": update_data}
         )
+        invalidar(usuario_atual(), "objetivos")
+        return result.modified_count > 0
+    
+    def concluir_objetivo(self, objetivo_id):
+        """Marca um objetivo como concluído"""
+        result = self.colecao.update_one(
+            {"_id": objetivo_id},
+            {"$set": {"status": "concluido"}}
+        )
+        invalidar(usuario_atual(), "objetivos")
         return result.modified_count > 0
     
     def calcular_progresso(self, valor_atual, valor_meta):
@@ -80,9 +96,9 @@ class ObjetivosService:
             return 0
         return min((valor_atual / valor_meta) * 100, 100)
     
-    def dias_restantes(self, prazo_str):
+    def dias_restantes(self, prazo):
         """Calcula dias restantes para meta"""
-        prazo = datetime.strptime(prazo_str, "%Y-%m-%d")
+        prazo = para_datetime(prazo)
         hoje = datetime.now()
         delta = prazo - hoje
         return delta.days
\ No newline at end of file
@@ -0,0 +1,129 @@
+from pymongo.errors import PyMongoError, OperationFailure
+from services import cache
+import threading
+import atexit
+
+# Coleções cujas mudanças invalidam o cache das leituras -> coleção usada como chave do cache.
+# As derivadas (resumo mensal e parcelas) são gravadas depois da coleção base: observá-las
+# evita que outro processo releia o resumo/parcelas entre as duas escritas e guarde a cópia antiga.
+COLECOES_OBSERVADAS = {
+    "transacoes": "transacoes",
+    "transacoes_mensal": "transacoes",
+    "compras_cartao": "compras_cartao",
+    "parcelas_cartao": "compras_cartao",
+    "cartoes": "cartoes",
+    "objetivos": "objetivos",
+}
+
+# Código do servidor quando o resume token saiu do oplog
+HISTORICO_PERDIDO = 286
+
+_observador = None
+_observador_lock = threading.Lock()
+
+
+class ObservadorMudancas(threading.Thread):
+    """Escuta change streams do banco e invalida o cache deste processo"""
+
+    def __init__(self, db, colecoes=None, espera_reconexao=5, ao_invalidar=None):
+        super().__init__(name="observador-mudancas", daemon=True)
+        self.db = db
+        self.colecoes = colecoes or COLECOES_OBSERVADAS
+        self.espera_reconexao = espera_reconexao
+        self.ao_invalidar = ao_invalidar
+        self.resume_token = None
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+
+    def _invalidar(self, user_email, colecao):
+        cache.invalidar(user_email, colecao)
+        if self.ao_invalidar:
+            self.ao_invalidar(user_email, colecao)
+
+    def _processar(self, mudanca):
+        """Invalida as entradas do usuário dono do documento alterado"""
+        colecao = mudanca.get("ns", {}).get("coll")
+        if colecao not in self.colecoes:
+            # drop/dropDatabase/invalidate: não há como saber o usuário
+            for chave in set(self.colecoes.values()):
+                self._invalidar(None, chave)
+            return
+
+        chave = self.colecoes[colecao]
+        documento = mudanca.get("fullDocument") or mudanca.get("fullDocumentBeforeChange")
+        if documento and "user_email" in documento:
+            self._invalidar(documento["user_email"], chave)
+        else:
+            # Exclusões não trazem o documento: invalida a coleção para todos
+            self._invalidar(None, chave)
+
+    def run(self):
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": {"$in": list(self.colecoes)}},
+            {"operationType": {"$in": ["dropDatabase", "invalidate"]}}
+        ]}}]
+
+        while not self._parar.is_set():
+            try:
+                with self.db.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=self.resume_token,
+                    max_await_time_ms=1000
+                ) as stream:
+                    while stream.alive and not self._parar.is_set():
+                        mudanca = stream.try_next()
+                        if mudanca is not None:
+                            self._processar(mudanca)
+                            if mudanca["operationType"] == "invalidate":
+                                # Um stream invalidado não pode ser retomado
+                                self.resume_token = None
+                                break
+                        # Guarda o token mesmo sem eventos para retomar do ponto certo
+                        self.resume_token = stream.resume_token
+
+            except OperationFailure as e:
+                if e.code == HISTORICO_PERDIDO:
+                    # Eventos perdidos: recomeça do zero e descarta o cache inteiro
+                    self.resume_token = None
+                    for chave in set(self.colecoes.values()):
+                        self._invalidar(None, chave)
+                self._parar.wait(self.espera_reconexao)
+
+            except PyMongoError:
+                # Queda de conexão: reabre o stream a partir do último token
+                self._parar.wait(self.espera_reconexao)
+
+
+def iniciar_observador(db, **kwargs):
+    """Inicia o observador do processo (apenas uma vez)"""
+    global _observador
+
+    with _observador_lock:
+        if _observador is None or not _observador.is_alive():
+            _observador = ObservadorMudancas(db, **kwargs)
+            _observador.start()
+            atexit.register(_observador.parar)
+
+    return _observador
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    # Modo de teste: mostra as invalidações (exige replica set, mesmo de um único nó)
+    db = get_client().get_database(NOME_BANCO)
+    observador = ObservadorMudancas(
+        db, ao_invalidar=lambda user_email, colecao: print(f"invalidado: {colecao} ({user_email or 'todos'})")
+    )
+    observador.start()
+    try:
+        observador.join()
+    except KeyboardInterrupt:
+        observador.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+from config.db_config import connect_db
+from pymongo import UpdateOne
+from bson import ObjectId
+from services.datas import para_datetime, expressao_data_normalizada
+from services.dinheiro import centavos, expressao_centavos
+from services.cache import em_cache, sem_cache
+import streamlit as st
+import pandas as pd
+import argparse
+
+# Totais pré-somados por usuário, mês, categoria principal e subcategoria
+COLECAO_RESUMO = "transacoes_mensal"
+CHAVE_RESUMO = ["user_email", "ano_mes", "categoria_principal", "subcategoria"]
+# Documentos obsoletos removidos por comando ao final de uma reconstrução
+TAMANHO_LOTE_REMOCAO = 1000
+# Colunas do DataFrame lido pelas páginas
+COLUNAS_RESUMO = ["AnoMes", "Categoria Principal", "Subcategoria", "Centavos", "Quantidade"]
+
+
+def registrar_no_resumo(db, transacao, sinal=1):
+    """Soma (ou subtrai, com sinal=-1) uma transação no resumo mensal"""
+    data = para_datetime(transacao["data"])
+    if data is None:
+        return
+
+    db.get_collection(COLECAO_RESUMO).update_one(
+        {
+            "user_email": transacao.get("user_email", ""),
+            "ano_mes": data.strftime("%Y-%m"),
+            "categoria_principal": transacao["categoria_principal"],
+            "subcategoria": transacao["subcategoria"]
+        },
+        {"$inc": {"total": sinal * centavos(transacao["valor"]), "quantidade": sinal}},
+        upsert=True
+    )
+
+
+def registrar_lote_no_resumo(db, transacoes, sinal=1):
+    """Soma um lote de transações no resumo mensal com uma atualização por grupo"""
+    totais = {}
+    for transacao in transacoes:
+        data = para_datetime(transacao["data"])
+        if data is None:
+            continue
+        chave = (
+            transacao.get("user_email", ""),
+            data.strftime("%Y-%m"),
+            transacao["categoria_principal"],
+            transacao["subcategoria"]
+        )
+        total, quantidade = totais.get(chave, (0, 0))
+        totais[chave] = (total + sinal * centavos(transacao["valor"]), quantidade + sinal)
+
+    if totais:
+        db.get_collection(COLECAO_RESUMO).bulk_write([
+            UpdateOne(
+                dict(zip(CHAVE_RESUMO, chave)),
+                {"$inc": {"total": total, "quantidade": quantidade}},
+                upsert=True
+            )
+            for chave, (total, quantidade) in totais.items()
+        ], ordered=False)
+
+
+def reconstruir_resumo(db, user_email=None):
+    """Recalcula o resumo mensal a partir das transações, sem deixá-lo vazio durante o cálculo"""
+    filtro = {"user_email": user_email} if user_email is not None else {}
+    resumo = db.get_collection(COLECAO_RESUMO)
+
+    # Os documentos atuais continuam servindo as páginas enquanto o $merge os substitui; no fim
+    # saem só os anteriores que o cálculo não tocou (grupos que não existem mais). Documentos
+    # criados por novas transações durante o cálculo não estão nessa lista e ficam.
+    reconstrucao = ObjectId()
+    anteriores = [documento["_id"] for documento in resumo.find(filtro, {"_id": 1})]
+
+    pipeline = [
+        {"$match": filtro},
+        {"$project": {
+            "user_email": {"$ifNull": ["$user_email", ""]},
+            "categoria_principal": 1,
+            "subcategoria": 1,
+            "valor": expressao_centavos("valor"),
+            "data": expressao_data_normalizada("data")
+        }},
+        {"$match": {"data": {"$type": "date"}}},
+        {"$group": {
+            "_id": {
+                "user_email": "$user_email",
+                "ano_mes": {"$dateToString": {"date": "$data", "format": "%Y-%m"}},
+                "categoria_principal": "$categoria_principal",
+                "subcategoria": "$subcategoria"
+            },
+            "total": {"$sum": "$valor"},
+            "quantidade": {"$sum": 1}
+        }},
+        {"$replaceWith": {"$mergeObjects": [
+            "$_id", {"total": "$total", "quantidade": "$quantidade", "reconstrucao": reconstrucao}
+        ]}},
+        {"$merge": {
+            "into": COLECAO_RESUMO,
+            "on": CHAVE_RESUMO,
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+    db.get_collection("transacoes").aggregate(pipeline)
+
+    for inicio in range(0, len(anteriores), TAMANHO_LOTE_REMOCAO):
+        resumo.delete_many({
+            "_id": {"$in": anteriores[inicio:inicio + TAMANHO_LOTE_REMOCAO]},
+            "reconstrucao": {"$ne": reconstrucao}
+        })
+    return resumo.count_documents(filtro)
+
+
+@em_cache("transacoes")
+def get_resumo_mensal(user_email):
+    """Carrega o resumo mensal do usuário (totais em centavos e número de transações)"""
+    try:
+        db = connect_db()
+        documentos = list(db.get_collection(COLECAO_RESUMO).find(
+            {"user_email": user_email, "quantidade": {"$gt": 0}},
+            {"_id": 0, "ano_mes": 1, "categoria_principal": 1, "subcategoria": 1, "total": 1, "quantidade": 1}
+        ).sort("ano_mes", 1))
+
+        if not documentos:
+            return pd.DataFrame(columns=COLUNAS_RESUMO)
+
+        # Resumos anteriores à migração ainda podem estar em reais
+        df = pd.DataFrame([{**d, "total": centavos(d["total"])} for d in documentos]).rename(columns={
+            "ano_mes": "AnoMes",
+            "categoria_principal": "Categoria Principal",
+            "subcategoria": "Subcategoria",
+            "total": "Centavos",
+            "quantidade": "Quantidade"
+        })
+        return df.astype({"Centavos": "int64", "Quantidade": "int64"})
+
+    except Exception as e:
+        st.error(f"Erro ao carregar resumo mensal: {str(e)}")
+        return sem_cache(pd.DataFrame(columns=COLUNAS_RESUMO))
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    parser = argparse.ArgumentParser(description="Reconstrói o resumo mensal de transações")
+    parser.add_argument("--email", help="reconstrói apenas o resumo deste usuário")
+    args = parser.parse_args()
+
+    db = get_client().get_database(NOME_BANCO)
+    total = reconstruir_resumo(db, args.email)
+    print(f"{COLECAO_RESUMO}: {total} documentos")
+
+
+if __name__ == "__main__":
+    main()
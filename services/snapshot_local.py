@@ -0,0 +1,249 @@
+from services.datas import para_datetime
+from services.dinheiro import centavos
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import DESCENDING
+import streamlit as st
+import pandas as pd
+import threading
+import argparse
+import hashlib
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Coleções com cópia local: campos lidos, campo de data, campo de criação (marca d'água)
+# e campos de dinheiro (gravados em centavos)
+COLECOES_SNAPSHOT = {
+    "transacoes": {
+        "campos": ["data", "descricao", "categoria_principal", "subcategoria", "valor"],
+        "data": "data",
+        "criacao": "criado_em",
+        "dinheiro": ["valor"]
+    },
+}
+
+# Muda quando o formato do arquivo muda; snapshots de outra versão são recriados
+VERSAO_SNAPSHOT = 2
+
+CAMPO_ATUALIZACAO = "atualizado_em"
+COLECAO_REMOCOES = "remocoes"
+
+# Relógios de processos diferentes podem divergir: cada busca incremental repete uma margem
+MARGEM_MARCA = timedelta(minutes=5)
+
+# Últimos snapshots usados neste processo, para não reler o disco a cada atualização
+MAX_EM_MEMORIA = 32
+_em_memoria = OrderedDict()
+_lock = threading.Lock()
+
+
+def _diretorio():
+    """Diretório dos snapshots (SNAPSHOT_DIR no secrets.toml)"""
+    try:
+        diretorio = st.secrets.get("SNAPSHOT_DIR", ".snapshots")
+    except Exception:
+        diretorio = ".snapshots"
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def _caminho(user_email, colecao):
+    """Arquivo do snapshot; o e-mail vira hash para não aparecer no nome"""
+    usuario = hashlib.sha256(user_email.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(_diretorio(), f"{usuario}_{colecao}.parquet")
+
+
+def _texto_marca(valor):
+    """Datas de criação/atualização são gravadas em ISO; normaliza para comparar como texto"""
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor) if valor else ""
+
+
+def registrar_remocao(db, colecao, documento_id, user_email):
+    """Grava a lápide de um documento excluído para as sincronizações incrementais"""
+    db.get_collection(COLECAO_REMOCOES).insert_one({
+        "colecao": colecao,
+        "documento_id": documento_id,
+        "user_email": user_email,
+        "removido_em": datetime.now().isoformat()
+    })
+
+
+def _projecao(config):
+    return {"_id": 1, config["criacao"]: 1, CAMPO_ATUALIZACAO: 1, **{campo: 1 for campo in config["campos"]}}
+
+
+def _para_frame(documentos, config):
+    """Converte documentos do MongoDB no formato do snapshot"""
+    # Centavos convertidos antes do DataFrame: uma coluna com int e float viraria float
+    documentos = [
+        {**documento, **{campo: centavos(documento.get(campo)) for campo in config["dinheiro"]}}
+        for documento in documentos
+    ]
+    df = pd.DataFrame(documentos, columns=["_id", *config["campos"]])
+    df.insert(0, "id", df.pop("_id").astype(str))
+
+    # Datas em texto legado viram datetime; ObjectId vira texto para caber no Parquet
+    df[config["data"]] = pd.to_datetime(df[config["data"]].map(para_datetime), errors="coerce")
+    for campo in config["dinheiro"]:
+        df[campo] = df[campo].astype("int64")
+    return df
+
+
+def _maior_marca(marca, documentos, config):
+    """Maior data de criação/atualização vista"""
+    for documento in documentos:
+        for campo in (config["criacao"], CAMPO_ATUALIZACAO):
+            marca = max(marca, _texto_marca(documento.get(campo)))
+    return marca
+
+
+def _guardar(user_email, colecao, df, metadados):
+    """Mantém o snapshot em memória e grava o Parquet de forma atômica"""
+    config = COLECOES_SNAPSHOT[colecao]
+    df = df.sort_values(config["data"], ascending=False).reset_index(drop=True)
+
+    with _lock:
+        _em_memoria[(user_email, colecao)] = (df, metadados)
+        _em_memoria.move_to_end((user_email, colecao))
+        while len(_em_memoria) > MAX_EM_MEMORIA:
+            _em_memoria.popitem(last=False)
+
+    if pq is not None:
+        caminho = _caminho(user_email, colecao)
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}),
+            b"snapshot": json.dumps(metadados).encode("utf-8")
+        })
+        temporario = f"{caminho}.tmp"
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, caminho)
+
+    return df
+
+
+def sincronizar_snapshot(db, user_email, colecao):
+    """Recarrega toda a coleção do usuário do MongoDB e regrava o snapshot"""
+    config = COLECOES_SNAPSHOT[colecao]
+
+    documentos = list(db.get_collection(colecao).find({"user_email": user_email}, _projecao(config)))
+    ultima_remocao = db.get_collection(COLECAO_REMOCOES).find_one(
+        {"user_email": user_email, "colecao": colecao},
+        {"_id": 0, "removido_em": 1},
+        sort=[("removido_em", DESCENDING)]
+    )
+
+    marca = _maior_marca(_texto_marca((ultima_remocao or {}).get("removido_em")), documentos, config)
+    return _guardar(user_email, colecao, _para_frame(documentos, config), {"marca": marca, "versao": VERSAO_SNAPSHOT})
+
+
+def carregar_snapshot(user_email, colecao):
+    """Snapshot do processo ou do disco (lido com memory map); None se não existir"""
+    with _lock:
+        if (user_email, colecao) in _em_memoria:
+            _em_memoria.move_to_end((user_email, colecao))
+            return _em_memoria[(user_email, colecao)]
+
+    caminho = _caminho(user_email, colecao)
+    if pq is None or not os.path.exists(caminho):
+        return None
+
+    tabela = pq.read_table(caminho, memory_map=True)
+    metadados = json.loads((tabela.schema.metadata or {}).get(b"snapshot", b"{}"))
+    if "marca" not in metadados or metadados.get("versao") != VERSAO_SNAPSHOT:
+        return None
+
+    df = tabela.to_pandas()
+    with _lock:
+        _em_memoria[(user_email, colecao)] = (df, metadados)
+        while len(_em_memoria) > MAX_EM_MEMORIA:
+            _em_memoria.popitem(last=False)
+    return df, metadados
+
+
+def atualizar_snapshot(db, user_email, colecao, df, metadados):
+    """Traz apenas documentos criados, editados ou excluídos depois da marca d'água"""
+    config = COLECOES_SNAPSHOT[colecao]
+    marca = metadados["marca"]
+
+    inicio = ""
+    if marca:
+        inicio = (datetime.fromisoformat(marca) - MARGEM_MARCA).isoformat()
+
+    novos = list(db.get_collection(colecao).find(
+        {"user_email": user_email, "$or": [
+            {config["criacao"]: {"$gt": inicio}},
+            {CAMPO_ATUALIZACAO: {"$gt": inicio}}
+        ]},
+        _projecao(config)
+    ))
+    remocoes = list(db.get_collection(COLECAO_REMOCOES).find(
+        {"user_email": user_email, "colecao": colecao, "removido_em": {"$gt": inicio}},
+        {"_id": 0, "documento_id": 1, "removido_em": 1}
+    ))
+
+    if novos or remocoes:
+        afetados = {str(documento["_id"]) for documento in novos}
+        afetados |= {str(remocao["documento_id"]) for remocao in remocoes}
+
+        df = pd.concat(
+            [df[~df["id"].isin(afetados)], _para_frame(novos, config)],
+            ignore_index=True
+        )
+        for remocao in remocoes:
+            marca = max(marca, _texto_marca(remocao["removido_em"]))
+        marca = _maior_marca(marca, novos, config)
+
+        return _guardar(user_email, colecao, df, {**metadados, "marca": marca})
+
+    # Exclusões feitas sem lápide (fora dos services) só aparecem na contagem. Ela percorre o
+    # índice do usuário inteiro, então roda apenas nas atualizações sem mudanças desde a margem
+    # da marca d'água (a maioria); uma divergência escondida por mudanças aparece na próxima sem
+    if len(df) != db.get_collection(colecao).count_documents({"user_email": user_email}):
+        return sincronizar_snapshot(db, user_email, colecao)
+
+    return df
+
+
+def carregar_ou_sincronizar(db, user_email, colecao):
+    """Snapshot local atualizado incrementalmente; sincronização completa se ainda não existir"""
+    snapshot = carregar_snapshot(user_email, colecao)
+    if snapshot is None:
+        df = sincronizar_snapshot(db, user_email, colecao)
+    else:
+        df = atualizar_snapshot(db, user_email, colecao, *snapshot)
+
+    return df.drop(columns=["id"])
+
+
+def main():
+    from config.db_config import get_client, NOME_BANCO
+
+    parser = argparse.ArgumentParser(description="Sincroniza os snapshots locais (Parquet) de um usuário")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--colecoes", nargs="+", choices=list(COLECOES_SNAPSHOT), default=list(COLECOES_SNAPSHOT))
+    parser.add_argument("--completa", action="store_true", help="ignora a marca d'água e recarrega tudo")
+    args = parser.parse_args()
+
+    if pq is None:
+        parser.error("pyarrow não está instalado")
+
+    db = get_client().get_database(NOME_BANCO)
+    for colecao in args.colecoes:
+        if args.completa:
+            df = sincronizar_snapshot(db, args.email, colecao)
+        else:
+            df = carregar_ou_sincronizar(db, args.email, colecao)
+        print(f"{colecao}: {len(df)} documentos em {_caminho(args.email, colecao)}")
+
+
+if __name__ == "__main__":
+    main()
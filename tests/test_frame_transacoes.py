@@ -0,0 +1,24 @@
+from services.frame_transacoes import FrameTransacoes
+import pandas as pd
+
+
+def _frame(datas):
+    return FrameTransacoes(pd.DataFrame({
+        "Data": pd.to_datetime(datas),
+        "Categoria Principal": ["Despesa"] * len(datas),
+        "Centavos": [100] * len(datas),
+    }))
+
+
+def test_serie_com_datas_invalidas():
+    serie, rotulo = _frame([None, None]).serie_temporal()
+    assert serie.empty and rotulo == "Diária"
+
+    serie, _ = _frame(["2024-01-01", None, "2024-01-01"]).serie_temporal()
+    assert serie["Centavos"].tolist() == [200]
+
+
+def test_serie_muda_de_periodo_pelo_intervalo():
+    assert _frame(["2024-01-01", "2024-03-01"]).serie_temporal()[1] == "Diária"
+    assert _frame(["2020-01-01", "2024-01-01"]).serie_temporal()[1] == "Semanal"
+    assert _frame(["2000-01-01", "2024-01-01"]).serie_temporal()[1] == "Mensal"
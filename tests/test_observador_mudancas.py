@@ -0,0 +1,107 @@
+from services.observador_mudancas import ObservadorMudancas, COLECOES_OBSERVADAS
+from services import cache
+from pymongo.errors import AutoReconnect
+
+
+class _StreamFalso:
+    """Change stream simulado: entrega os eventos e encerra o observador ao esgotá-los"""
+
+    def __init__(self, eventos, ao_esgotar):
+        self.eventos = list(eventos)
+        self.ao_esgotar = ao_esgotar
+        self.alive = True
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+    def try_next(self):
+        if not self.eventos:
+            self.ao_esgotar()
+            return None
+        evento = self.eventos.pop(0)
+        self.resume_token = {"_data": evento["_id"]}
+        return evento
+
+
+class _BancoFalso:
+    """Banco com watch() simulado: cada abertura consome o próximo item (lista de eventos ou exceção)"""
+
+    def __init__(self, *aberturas):
+        self.aberturas = list(aberturas)
+        self.chamadas = []
+        self.observador = None
+
+    def watch(self, pipeline, **opcoes):
+        self.chamadas.append((pipeline, opcoes))
+        abertura = self.aberturas.pop(0)
+        if isinstance(abertura, Exception):
+            raise abertura
+        return _StreamFalso(abertura, self.observador.parar)
+
+
+def _evento(numero, colecao, operacao="update", documento=None):
+    evento = {"_id": numero, "operationType": operacao, "ns": {"db": "financas", "coll": colecao}}
+    if documento is not None:
+        evento["fullDocument"] = documento
+    return evento
+
+
+def _observar(*aberturas):
+    """Roda o observador até esgotar os eventos; retorna o banco falso e as invalidações"""
+    invalidacoes = []
+    db = _BancoFalso(*aberturas)
+    observador = ObservadorMudancas(
+        db, espera_reconexao=0, ao_invalidar=lambda user_email, colecao: invalidacoes.append((user_email, colecao))
+    )
+    db.observador = observador
+    observador.run()
+    return db, observador, invalidacoes
+
+
+def test_colecoes_derivadas_usam_chave_da_base():
+    _, _, invalidacoes = _observar([
+        _evento(1, "transacoes_mensal", documento={"user_email": "a@b.com"}),
+        _evento(2, "parcelas_cartao", "insert", documento={"user_email": "a@b.com"}),
+        _evento(3, "transacoes", "insert", documento={"user_email": "c@d.com"}),
+    ])
+    assert invalidacoes == [("a@b.com", "transacoes"), ("a@b.com", "compras_cartao"), ("c@d.com", "transacoes")]
+
+
+def test_pipeline_inclui_colecoes_derivadas():
+    db, _, _ = _observar([])
+    pipeline, opcoes = db.chamadas[0]
+    assert set(pipeline[0]["$match"]["$or"][0]["ns.coll"]["$in"]) == set(COLECOES_OBSERVADAS)
+    assert opcoes["full_document"] == "updateLookup"
+
+
+def test_exclusao_sem_documento_invalida_todos():
+    _, _, invalidacoes = _observar([_evento(1, "parcelas_cartao", "delete")])
+    assert invalidacoes == [(None, "compras_cartao")]
+
+
+def test_invalidate_invalida_tudo_e_descarta_token():
+    db, observador, invalidacoes = _observar(
+        [_evento(1, "objetivos", documento={"user_email": "a@b.com"}), _evento(2, None, "invalidate")],
+        []
+    )
+    assert invalidacoes[0] == ("a@b.com", "objetivos")
+    assert sorted(invalidacoes[1:]) == sorted((None, chave) for chave in set(COLECOES_OBSERVADAS.values()))
+    # O stream reaberto após o invalidate não retoma do token antigo
+    assert db.chamadas[1][1]["resume_after"] is None
+    assert observador.resume_token is None
+
+
+def test_reconexao_retoma_do_ultimo_token():
+    db, _, invalidacoes = _observar(AutoReconnect("queda"), [_evento(7, "cartoes", documento={"user_email": "a@b.com"})])
+    assert len(db.chamadas) == 2
+    assert invalidacoes == [("a@b.com", "cartoes")]
+
+
+def test_invalida_o_cache_do_processo():
+    antes = cache._versoes_atuais("a@b.com", ["transacoes"])
+    _observar([_evento(1, "transacoes_mensal", documento={"user_email": "a@b.com"})])
+    assert cache._versoes_atuais("a@b.com", ["transacoes"]) != antes
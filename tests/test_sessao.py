@@ -0,0 +1,42 @@
+from auth.sessao import criar_token, validar_token, _b64, _de_b64
+import json
+
+AGORA = 1_700_000_000
+
+
+def _trocar_conteudo(token, **campos):
+    """Altera o conteúdo do token mantendo a assinatura original"""
+    conteudo, assinatura = token.split(".")
+    dados = {**json.loads(_de_b64(conteudo)), **campos}
+    return f"{_b64(json.dumps(dados).encode('utf-8'))}.{assinatura}"
+
+
+def test_token_valido():
+    token = criar_token("a@b.com", 3, agora=AGORA)
+    assert validar_token(token, agora=AGORA + 60) == ("a@b.com", 3)
+
+
+def test_conteudo_alterado():
+    token = criar_token("a@b.com", 0, agora=AGORA)
+    assert validar_token(_trocar_conteudo(token, email="outro@b.com"), agora=AGORA) is None
+    assert validar_token(_trocar_conteudo(token, expira=AGORA * 2), agora=AGORA) is None
+
+
+def test_assinatura_alterada():
+    token = criar_token("a@b.com", 0, agora=AGORA)
+    conteudo, assinatura = token.split(".")
+    outra = "A" if assinatura[0] != "A" else "B"
+    assert validar_token(f"{conteudo}.{outra}{assinatura[1:]}", agora=AGORA) is None
+    assert validar_token(f"{conteudo}.", agora=AGORA) is None
+
+
+def test_token_expirado():
+    token = criar_token("a@b.com", 0, agora=AGORA)
+    expira = json.loads(_de_b64(token.split(".")[0]))["expira"]
+    assert validar_token(token, agora=expira - 1) is not None
+    assert validar_token(token, agora=expira) is None
+
+
+def test_token_malformado():
+    for token in ["", "lixo", "a.b.c", "...", "não-ascii.ção", None, 123]:
+        assert validar_token(token, agora=AGORA) is None